@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+#     -Benchmark do tratamento do endereço: getAddr original (sete testes por componente, com reindexação do raw) contra a
+#      getAddr com a tabela de tipos (uma passada), com um Location do geopy e com o payload bruto do cache.
+#
+#     Uso: python benchmarks/bench_getaddr.py [--payloads 200000]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from geopy.location import Location
+from reverse_geocode_linux import getAddr
+
+
+def getAddr_original(location):
+    """Implementação anterior da função getAddr, mantida aqui apenas para comparação."""
+    road = house_number = suburb = city = postcode = state = country = 'no content returned'
+
+    for i in range(len(location.raw['address_components'])):
+        if 'route' in location.raw['address_components'][i]['types']:
+            road = location.raw['address_components'][i]['short_name']
+
+        if 'street_number' in location.raw['address_components'][i]['types']:
+            house_number = location.raw['address_components'][i]['short_name']
+
+        if 'sublocality' in location.raw['address_components'][i]['types']:
+            suburb = location.raw['address_components'][i]['short_name']
+
+        if 'administrative_area_level_2' in location.raw['address_components'][i]['types']:
+            city = location.raw['address_components'][i]['short_name']
+
+        if 'postal_code' in location.raw['address_components'][i]['types']:
+            postcode = location.raw['address_components'][i]['short_name']
+
+        if 'administrative_area_level_1' in location.raw['address_components'][i]['types']:
+            state = location.raw['address_components'][i]['short_name']
+
+        if 'country' in location.raw['address_components'][i]['types']:
+            country = location.raw['address_components'][i]['long_name']
+
+    addr = [location.latitude, location.longitude, road, house_number, suburb, city, postcode, state, country]
+    return addr
+
+
+def payload(rnd):
+    """Gera um payload no formato de um resultado do GoogleV3 (componentes com vários tipos, como na API)."""
+    components = [
+        {'long_name': str(rnd.randint(1, 3000)), 'short_name': str(rnd.randint(1, 3000)), 'types': ['street_number']},
+        {'long_name': 'Rua Monsenhor Veras', 'short_name': 'R. Monsenhor Veras', 'types': ['route']},
+        {'long_name': 'Santana', 'short_name': 'Santana', 'types': ['political', 'sublocality', 'sublocality_level_1']},
+        {'long_name': 'Porto Alegre', 'short_name': 'Porto Alegre', 'types': ['administrative_area_level_2', 'political']},
+        {'long_name': 'Rio Grande do Sul', 'short_name': 'RS', 'types': ['administrative_area_level_1', 'political']},
+        {'long_name': 'Brasil', 'short_name': 'BR', 'types': ['country', 'political']},
+        {'long_name': '90610-010', 'short_name': '90610-010', 'types': ['postal_code']},
+    ]
+    lat, lon = -30 + rnd.random(), -51 + rnd.random()
+    return {'address_components': components, 'formatted_address': 'R. Monsenhor Veras, 361 - Santana, Porto Alegre',
+            'geometry': {'location': {'lat': lat, 'lng': lon}}}
+
+
+def run(name, function, inputs):
+    """Trata todos os payloads e retorna a quantidade de endereços por segundo."""
+    start = time.perf_counter()
+    for item in inputs:
+        function(item)
+    elapsed = time.perf_counter() - start
+    rate = len(inputs)/elapsed
+    print('%-28s %12.0f endereços/s  (%.2f s)' % (name, rate, elapsed))
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do tratamento do endereço (getAddr).')
+    parser.add_argument('--payloads', type=int, default=200000, help='quantidade de payloads tratados (padrão: 200000)')
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    raws = [payload(rnd) for _ in range(args.payloads)]
+    locations = [Location(raw['formatted_address'], (raw['geometry']['location']['lat'], raw['geometry']['location']['lng']), raw)
+                 for raw in raws]
+    for location in locations[:1000]: # as duas implementações devem produzir o mesmo endereço
+        assert list(getAddr(location)) == getAddr_original(location) == list(getAddr(location.raw))
+
+    before = run('getAddr original (Location)', getAddr_original, locations)
+    after = run('getAddr (Location)', getAddr, locations)
+    raw = run('getAddr (payload bruto)', getAddr, raws)
+    print('ganho: %.1fx (Location), %.1fx (payload bruto)' % (after/before, raw/before))
+
+
+if __name__ == '__main__':
+    main()
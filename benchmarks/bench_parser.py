@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+#     -Benchmark da leitura dos arquivos texto: read_file (linha a linha) contra parse_file_numpy (mmap + regex + NumPy).
+#      Com --check, em vez do benchmark, confere que read_file, parse_file_numpy e a concatenação dos blocos de parse_range
+#      (file_ranges) extraem os mesmos pares de arquivos com casos de borda: blocos que cortam as linhas, fim de linha CRLF,
+#      latitudes e longitudes órfãs e arquivos sem a quebra de linha final.
+#
+#     Uso: python benchmarks/bench_parser.py [--lines 10000000] [--check] [--files 300]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from reverse_geocode_linux import file_ranges, np, parse_file_numpy, parse_range, read_file
+
+CHECK_CHUNK_SIZES = (1, 7, 100, 4096) # tamanhos de bloco, em bytes, conferidos pelo --check
+
+
+def generate(path, lines, seed=0):
+    """Gera um arquivo no formato dos data_points, com linhas de latitude e longitude órfãs e linhas sem geometria."""
+    rnd = random.Random(seed)
+    written = 0
+    with open(path, 'w') as arquivo:
+        while written < lines:
+            if rnd.random() > 0.02: # 2% de latitudes sem longitude
+                arquivo.write('Latitude: 30 02 59 %.8f\nLongitude: 51 12 05 %.8f\nSpeed: 0 km h 12\n'
+                              % (-30 + rnd.random(), -51 + rnd.random()))
+                written += 3
+            else:
+                arquivo.write('Latitude: 30 02 59 %.8f\n' % (-30 + rnd.random()))
+                written += 1
+
+
+def generate_edge_cases(path, seed):
+    """Gera um arquivo pequeno com uma mistura aleatória dos casos de borda da leitura."""
+    rnd = random.Random(seed)
+    newline = rnd.choice(('\n', '\r\n'))
+    value = lambda base: '%.*f' % (rnd.randint(0, 10), base + rnd.uniform(-1, 1))
+    lines = []
+    for _ in range(rnd.randint(0, 40)):
+        kind = rnd.random()
+        if kind < 0.5: # par completo
+            lines += ['Latitude: 30 02 59 %s' % value(-30), 'Longitude: 51 12 05 %s' % value(-51)]
+        elif kind < 0.6: # latitude órfã
+            lines.append('Latitude: 30 02 59 %s' % value(-30))
+        elif kind < 0.7: # longitude órfã
+            lines.append('Longitude: 51 12 05 %s' % value(-51))
+        elif kind < 0.8:
+            lines.append('Speed: 0 km h %d' % rnd.randint(0, 120))
+        elif kind < 0.9:
+            lines.append('')
+        else: # valor seguido de mais campos
+            lines += ['Latitude: 30 02 59 %s extra' % value(-30), 'Longitude: 51 12 05 %s 1 2' % value(-51)]
+    text = newline.join(lines)
+    if lines and rnd.random() < 0.5: # metade dos arquivos sem a quebra de linha final
+        text += newline
+    with open(path, 'w', newline='') as arquivo:
+        arquivo.write(text)
+
+
+def check(files, directory):
+    """Confere que as três leituras extraem os mesmos pares de "files" arquivos gerados por generate_edge_cases.
+
+    Os pares de read_file e de parse_range são comparados como texto; os de parse_file_numpy, como float.
+    """
+    path = os.path.join(directory, 'data_points_check.txt')
+    for seed in range(files):
+        generate_edge_cases(path, seed)
+        expected = list(read_file(path))
+        for chunk_size in CHECK_CHUNK_SIZES:
+            ranges = [pair for arguments in file_ranges(path, chunk_size) for pair in parse_range(*arguments)]
+            assert ranges == expected, 'parse_range difere de read_file (seed %d, blocos de %d bytes)' % (seed, chunk_size)
+            if np is None:
+                continue
+            vectorized = [pair for lats, lons in parse_file_numpy(path, chunk_size) for pair in zip(lats.tolist(), lons.tolist())]
+            assert vectorized == [(float(lat), float(lon)) for lat, lon in expected], \
+                'parse_file_numpy difere de read_file (seed %d, blocos de %d bytes)' % (seed, chunk_size)
+    print('%d arquivos conferidos, blocos de %s bytes%s' % (files, ', '.join(map(str, CHECK_CHUNK_SIZES)),
+                                                           '' if np is not None else ' (sem o NumPy: parse_file_numpy não conferida)'))
+
+
+def run(name, parse, path, lines):
+    """Executa uma leitura completa do arquivo e retorna as linhas por segundo e a quantidade de pares."""
+    start = time.perf_counter()
+    pairs = parse(path)
+    elapsed = time.perf_counter() - start
+    rate = lines/elapsed
+    print('%-20s %12.0f linhas/s  (%.2f s, %d pares)' % (name, rate, elapsed, pairs))
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da leitura dos arquivos texto.')
+    parser.add_argument('--lines', type=int, default=10000000, help='quantidade de linhas do arquivo gerado (padrão: 10000000)')
+    parser.add_argument('--dir', help='diretório do arquivo temporário (padrão: diretório temporário do sistema)')
+    parser.add_argument('--check', action='store_true',
+                        help='confere a equivalência das leituras em arquivos com casos de borda, em vez do benchmark')
+    parser.add_argument('--files', type=int, default=300, help='arquivos gerados pelo --check (padrão: 300)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        if args.check:
+            check(args.files, directory)
+            return
+        path = os.path.join(directory, 'data_points_bench.txt')
+        generate(path, args.lines)
+        before = run('read_file', lambda path: sum(1 for _ in read_file(path)), path, args.lines)
+        after = run('parse_file_numpy', lambda path: sum(len(lats) for lats, _ in parse_file_numpy(path)), path, args.lines)
+    print('ganho: %.1fx' % (after/before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+#     -Benchmark de ponta a ponta da função main, sem consumir a cota do GoogleV3.
+#
+#     Um servidor HTTP local imita o endpoint de geocodificação do Google (/maps/api/geocode/json), com latência, variação (jitter),
+#     taxa de erros 500 e de respostas 429 configuráveis, além de uma capacidade opcional em requisições/s acima da qual responde 429.
+#     O GoogleV3 é apontado para ele (domain/scheme) e a função main é executada, em um subprocesso por cenário, para cada combinação
+#     de modo, quantidade de produtoras e tamanho da entrada. O relatório em JSON traz requisições/s, latências p50/p95/p99 vistas pelo
+#     cliente e linhas/s gravadas no banco, para comparar versões.
+#
+#     No modo processes, --producers define a quantidade de processos do pool (--workers), para medir a escala com os núcleos.
+#
+#     Uso: python benchmarks/bench_pipeline.py [--producers 1 4 10] [--sizes 500 2000] [--modes threads async processes]
+#                                              [--latency 50] [--jitter 20] [--error-rate 0] [--rate-limit 0] [--capacity 0]
+#                                              [--output relatorio.json]
+
+import argparse
+import contextlib
+import glob
+import http.server
+import inspect
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+# ### Servidor simulado
+
+class mockGoogleHandler(http.server.BaseHTTPRequestHandler):
+    """Responde às requisições de geocodificação reversa no formato do GoogleV3, de acordo com a configuração do servidor."""
+
+    def do_GET(self):
+        config = self.server.config
+        time.sleep(max(0.0, random.gauss(config['latency'], config['jitter']))/1000)
+        draw = random.random()
+        if draw < config['rate_limit'] or not self.server.admit():
+            self.reply(429, {'status': 'OVER_QUERY_LIMIT', 'error_message': 'simulated rate limit'})
+        elif draw < config['rate_limit'] + config['error_rate']:
+            self.reply(500, {'status': 'UNKNOWN_ERROR', 'error_message': 'simulated server error'})
+        else:
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            lat, lon = (float(value) for value in query['latlng'][0].split(','))
+            self.reply(200, {'status': 'OK', 'results': [result(lat, lon)]})
+
+    def reply(self, code, body):
+        data = json.dumps(body).encode()
+        with self.server.lock:
+            self.server.responses[str(code)] = self.server.responses.get(str(code), 0) + 1
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def result(lat, lon):
+    """Monta um resultado com os componentes de endereço que a função getAddr utiliza."""
+    number = str(int(abs(lat*lon)*1000) % 3000)
+    components = [{'long_name': number, 'short_name': number, 'types': ['street_number']},
+                  {'long_name': 'Rua Monsenhor Veras', 'short_name': 'R. Monsenhor Veras', 'types': ['route']},
+                  {'long_name': 'Santana', 'short_name': 'Santana', 'types': ['political', 'sublocality', 'sublocality_level_1']},
+                  {'long_name': 'Porto Alegre', 'short_name': 'Porto Alegre', 'types': ['administrative_area_level_2', 'political']},
+                  {'long_name': 'Rio Grande do Sul', 'short_name': 'RS', 'types': ['administrative_area_level_1', 'political']},
+                  {'long_name': 'Brasil', 'short_name': 'BR', 'types': ['country', 'political']},
+                  {'long_name': '90610-010', 'short_name': '90610-010', 'types': ['postal_code']}]
+    return {'address_components': components, 'formatted_address': 'R. Monsenhor Veras, %s - Santana, Porto Alegre' % number,
+            'geometry': {'location': {'lat': lat, 'lng': lon}}, 'types': ['street_address']}
+
+
+def start_server(config):
+    """Inicia o servidor simulado em uma thread e retorna o servidor (porta em server.server_address[1])."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), mockGoogleHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.lock = threading.Lock()
+    server.responses = {}
+    arrivals = [] # momentos das requisições aceitas no último segundo
+
+    def admit():
+        """Aceita a requisição se a capacidade (requisições no último segundo) não foi atingida."""
+        if not config['capacity']:
+            return True
+        with server.lock:
+            now = time.monotonic()
+            while arrivals and arrivals[0] <= now - 1:
+                arrivals.pop(0)
+            if len(arrivals) >= config['capacity']:
+                return False
+            arrivals.append(now)
+            return True
+    server.admit = admit
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ### Execução de um cenário (subprocesso)
+
+def generate(path, pairs, seed=0):
+    """Gera um arquivo no formato dos data_points, com pares de coordenadas distintos."""
+    rnd = random.Random(seed)
+    with open(path, 'w') as arquivo:
+        for _ in range(pairs):
+            arquivo.write('Latitude: 30 02 59 %.8f\nLongitude: 51 12 05 %.8f\n' % (-30 + rnd.random(), -51 + rnd.random()))
+
+
+def percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo, em uma lista já ordenada."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(fraction*len(values))) - 1))]
+
+
+def run_scenario(scenario):
+    """Executa a função main contra o servidor simulado e retorna as medidas do cenário."""
+    sys.path.insert(0, ROOT)
+    import reverse_geocode_linux as r
+    from geopy.geocoders import GoogleV3
+
+    latencies = [] # segundos de cada chamada ao reverse, vistos pelo cliente (com sucesso ou não)
+    failures = []
+    original = GoogleV3.reverse
+    main_pid = os.getpid()
+    worker_files = {} # modo processes: cada processo do pool grava as suas latências em um arquivo próprio
+
+    def record(seconds):
+        if os.getpid() == main_pid:
+            latencies.append(seconds)
+            return
+        if os.getpid() not in worker_files:
+            worker_files[os.getpid()] = open(os.path.join(scenario['dir'], 'latencies_%d.txt' % os.getpid()), 'a', buffering=1)
+        worker_files[os.getpid()].write('%r\n' % seconds)
+
+    def timed(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            location = original(self, *args, **kwargs)
+        except Exception:
+            record(time.perf_counter() - start)
+            raise
+        if not inspect.isawaitable(location):
+            record(time.perf_counter() - start)
+            return location
+
+        async def wait():
+            try:
+                return await location
+            finally:
+                record(time.perf_counter() - start)
+        return wait()
+
+    GoogleV3.reverse = timed
+    r.geolocator = GoogleV3(api_key='benchmark', domain='127.0.0.1:%d' % scenario['port'], scheme='http', timeout=30)
+    r.reverse = r.geolocator.reverse
+    threading.excepthook = lambda hook: failures.append(repr(hook.exc_value)) # threads que terminaram com exceção
+
+    database = os.path.join(scenario['dir'], 'bench_%s_%d_%d.db' % (scenario['mode'], scenario['producers'], scenario['size']))
+    argv = [scenario['input'], '--database', database, '--no-cache', '--mode', scenario['mode'],
+            '--producers', str(scenario['producers']), '--concurrency', str(scenario['producers']),
+            '--workers', str(scenario['producers'])] + scenario['main_args']
+    for name in glob.glob(os.path.join(scenario['dir'], 'latencies_*.txt')): # arquivos do cenário anterior
+        os.remove(name)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        r.main(argv)
+    elapsed = time.perf_counter() - start
+    for name in glob.glob(os.path.join(scenario['dir'], 'latencies_*.txt')):
+        with open(name) as arquivo:
+            latencies.extend(float(line) for line in arquivo if line.strip())
+
+    connection = sqlite3.connect(database)
+    rows = connection.execute('SELECT COUNT(*) FROM addresses').fetchone()[0]
+    connection.close()
+    latencies.sort()
+    return {'elapsed_s': round(elapsed, 3),
+            'requests': len(latencies),
+            'requests_per_s': round(len(latencies)/elapsed, 1),
+            'latency_ms': {name: round(percentile(latencies, fraction)*1000, 2) if latencies else None
+                           for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))},
+            'rows': rows,
+            'rows_per_s': round(rows/elapsed, 1),
+            'thread_failures': len(failures),
+            'failure_examples': sorted(set(failures))[:3]}
+
+
+# ### Suíte
+
+def git_revision():
+    """Commit atual do repositório, para identificar a versão medida no relatório."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de ponta a ponta com um servidor de geocodificação simulado.')
+    parser.add_argument('--producers', type=int, nargs='+', default=[1, 4, 10], help='quantidades de produtoras (padrão: 1 4 10)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000], help='pares de coordenadas da entrada (padrão: 500 2000)')
+    parser.add_argument('--modes', nargs='+', choices=['threads', 'async', 'processes'], default=['threads'],
+                        help='modos de execução da main. No modo async, --producers define o --concurrency e, no modo '
+                             'processes, o --workers (padrão: threads)')
+    parser.add_argument('--latency', type=float, default=50, help='latência média do servidor, em ms (padrão: 50)')
+    parser.add_argument('--jitter', type=float, default=20, help='desvio padrão da latência, em ms (padrão: 20)')
+    parser.add_argument('--error-rate', type=float, default=0, help='fração das respostas com erro 500 (padrão: 0)')
+    parser.add_argument('--rate-limit', type=float, default=0, help='fração das respostas 429 OVER_QUERY_LIMIT (padrão: 0)')
+    parser.add_argument('--capacity', type=float, default=0,
+                        help='requisições por segundo aceitas pelo servidor; acima disso responde 429. 0 sem limite (padrão: 0)')
+    parser.add_argument('--timeout', type=float, default=600, help='tempo máximo de cada cenário, em segundos (padrão: 600)')
+    parser.add_argument('--main-args', default='', help="argumentos extras da main, Ex: '--rate 200 --batch-size 500'")
+    parser.add_argument('--output', help='arquivo do relatório JSON (padrão: saída padrão)')
+    parser.add_argument('--scenario', help=argparse.SUPPRESS) # uso interno: executa um cenário no subprocesso
+    args = parser.parse_args()
+
+    if args.scenario:
+        json.dump(run_scenario(json.loads(args.scenario)), sys.stdout)
+        return
+
+    config = {'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate, 'rate_limit': args.rate_limit,
+              'capacity': args.capacity}
+    server = start_server(config)
+    report = {'revision': git_revision(), 'python': sys.version.split()[0], 'server': config, 'scenarios': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, 'data_points_%d.txt' % size)
+            generate(path, size)
+            for mode in args.modes:
+                for producers in args.producers:
+                    scenario = {'mode': mode, 'producers': producers, 'size': size, 'input': path, 'dir': directory,
+                                'port': server.server_address[1], 'main_args': args.main_args.split()}
+                    with server.lock:
+                        server.responses.clear()
+                    entry = {'mode': mode, 'producers': producers, 'size': size}
+                    try:
+                        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--scenario', json.dumps(scenario)],
+                                                 capture_output=True, text=True, timeout=args.timeout)
+                        if process.returncode == 0:
+                            entry.update(json.loads(process.stdout))
+                        else:
+                            entry['error'] = process.stderr.strip().splitlines()[-1:]
+                    except subprocess.TimeoutExpired:
+                        entry['error'] = 'timeout after %.0f s' % args.timeout
+                    with server.lock:
+                        entry['server_responses'] = dict(server.responses)
+                    report['scenarios'].append(entry)
+                    print('%-8s producers=%-3d size=%-6d %s' % (mode, producers, size,
+                          'erro: %s' % entry['error'] if 'error' in entry else
+                          '%(requests_per_s)8.1f req/s  %(rows_per_s)8.1f linhas/s' % entry), file=sys.stderr)
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as arquivo:
+            json.dump(report, arquivo, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+#     -Benchmark das consultas espaciais sobre a tabela addresses: índice R-tree (addressIndex) contra a varredura completa da tabela,
+#      em consultas por retângulo (bbox), por raio (radius) e dos k mais próximos (nearest), em uma tabela de um milhão de linhas.
+#      Mede também o custo dos triggers que mantêm o índice na carga da tabela (--reuse-meters), comparado à criação do índice de uma
+#      vez, depois da carga (--spatial-index).
+#
+#     Uso: python benchmarks/bench_spatial.py [--rows 1000000] [--queries 200] [--scan-queries 5] [--database arquivo.db]
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from reverse_geocode_linux import addressIndex, addressRecord, bounding_box, create_spatial_index, create_table, distance_meters
+
+CENTER = (-30.03, -51.2) # Porto Alegre; os pontos são espalhados em um quadrado de 1 grau em volta
+
+
+def rows(amount, seed=0):
+    """Gera linhas da tabela addresses com pontos aleatórios em volta de CENTER."""
+    rnd = random.Random(seed)
+    for i in range(amount):
+        lat, lon = CENTER[0] - 0.5 + rnd.random(), CENTER[1] - 0.5 + rnd.random()
+        yield (lat, lon, 'R. Monsenhor Veras', str(i % 3000), 'Santana', 'Porto Alegre', '90610-010', 'RS', 'Brasil',
+               round(lat, 9), round(lon, 9))
+
+
+def load(path, amount, spatial):
+    """Cria a tabela em "path" e insere as linhas em transações de 10000, retornando o tempo da carga em segundos."""
+    connection = sqlite3.connect(path)
+    create_table(connection.cursor(), spatial=spatial)
+    start = time.perf_counter()
+    generator = rows(amount)
+    while True:
+        batch = [row for _, row in zip(range(10000), generator)]
+        if not batch:
+            break
+        connection.executemany('INSERT INTO addresses (latitude, longitude, rua, numero, bairro, cidade, cep, estado, pais, \
+                               lat_origem, lon_origem) VALUES (?,?,?,?,?,?,?,?,?,?,?)', batch)
+        connection.commit()
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+# ### Consultas sem índice (varredura completa)
+
+COLUMNS = 'latitude, longitude, rua, numero, bairro, cidade, cep, estado, pais'
+
+def scan_bbox(connection, min_lat, min_lon, max_lat, max_lon):
+    return [addressRecord._make(row) for row in connection.execute('SELECT %s FROM addresses WHERE latitude BETWEEN ? AND ? \
+                                                                   AND longitude BETWEEN ? AND ?' % COLUMNS,
+                                                                   (min_lat, max_lat, min_lon, max_lon))]
+
+
+def scan_radius(connection, lat, lon, meters):
+    found = [(distance_meters(lat, lon, record.latitude, record.longitude), record)
+             for record in scan_bbox(connection, *bounding_box(lat, lon, meters))]
+    return sorted((entry for entry in found if entry[0] <= meters), key=lambda entry: entry[0])
+
+
+def scan_nearest(connection, lat, lon, k):
+    found = [(distance_meters(lat, lon, row[0], row[1]), row) for row in connection.execute('SELECT %s FROM addresses' % COLUMNS)]
+    found.sort(key=lambda entry: entry[0])
+    return [(distance, addressRecord._make(row)) for distance, row in found[:k]]
+
+
+def run(name, function, points):
+    """Executa a consulta para cada ponto e retorna as consultas por segundo e os resultados."""
+    start = time.perf_counter()
+    results = [function(*point) for point in points]
+    elapsed = time.perf_counter() - start
+    rate = len(points)/elapsed
+    print('%-34s %10.1f consultas/s  (%.3f ms cada)' % (name, rate, elapsed/len(points)*1000))
+    return rate, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das consultas espaciais (R-tree) sobre a tabela addresses.')
+    parser.add_argument('--rows', type=int, default=1000000, help='linhas da tabela addresses (padrão: 1000000)')
+    parser.add_argument('--queries', type=int, default=200, help='consultas com o índice de cada tipo (padrão: 200)')
+    parser.add_argument('--scan-queries', type=int, default=5,
+                        help='consultas com a varredura completa de cada tipo, que são muito mais lentas (padrão: 5)')
+    parser.add_argument('--database', help='banco já carregado pelo benchmark, para não carregar de novo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.database
+        if path is None or not os.path.exists(path):
+            path = path or os.path.join(directory, 'spatial.db')
+            plain_path = os.path.join(directory, 'plain.db')
+            plain = load(plain_path, args.rows, spatial=False)
+            indexed = load(path, args.rows, spatial=True)
+            print('carga de %d linhas: %.1f s sem o índice, %.1f s com o índice (%.0f%% a mais)'
+                  % (args.rows, plain, indexed, (indexed/plain - 1)*100))
+            connection = sqlite3.connect(plain_path)
+            start = time.perf_counter()
+            create_spatial_index(connection.cursor())
+            bulk = time.perf_counter() - start
+            connection.close()
+            print('índice criado depois da carga: %.1f s (%.1f s no total, %.0f%% a mais que a carga sem o índice)'
+                  % (bulk, plain + bulk, bulk/plain*100))
+
+        connection = sqlite3.connect(path)
+        index = addressIndex(connection)
+        rnd = random.Random(1)
+        points = [(CENTER[0] - 0.5 + rnd.random(), CENTER[1] - 0.5 + rnd.random()) for _ in range(args.queries)]
+        boxes = [(lat - 0.005, lon - 0.005, lat + 0.005, lon + 0.005) for lat, lon in points] # ~1 km de lado
+
+        queries = [('bbox (~1 km)', index.bbox, lambda *box: scan_bbox(connection, *box), boxes),
+                   ('radius (500 m)', lambda lat, lon: index.radius(lat, lon, 500),
+                    lambda lat, lon: scan_radius(connection, lat, lon, 500), points),
+                   ('nearest (k=10)', lambda lat, lon: index.nearest(lat, lon, 10),
+                    lambda lat, lon: scan_nearest(connection, lat, lon, 10), points),
+                   ('nearby (50 m, --reuse-meters)', lambda lat, lon: index.nearby((lat, lon), 50), None, points)]
+        for name, indexed_query, scan_query, inputs in queries:
+            rate, results = run('%s com R-tree' % name, indexed_query, inputs)
+            if scan_query is None:
+                continue
+            scan_rate, scan_results = run('%s varredura' % name, scan_query, inputs[:args.scan_queries])
+            assert [sorted(result) for result in results[:args.scan_queries]] == [sorted(result) for result in scan_results]
+            print('ganho: %.0fx' % (rate/scan_rate))
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+#     -Benchmark da escrita dos endereços no banco de dados: INSERT + commit por linha (rotina original) contra o batchWriter.
+#
+#     Uso: python benchmarks/bench_writer.py [--rows 100000]
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from reverse_geocode_linux import create_table, configure_database, batchWriter
+
+
+def synthetic_addresses(rows, seed=0):
+    """Gera endereços sintéticos no mesmo formato retornado pela função getAddr."""
+    rnd = random.Random(seed)
+    return [[-30 + rnd.random(), -51 + rnd.random(), 'Rua %d' % rnd.randrange(5000), str(rnd.randrange(2000)),
+             'Bairro %d' % rnd.randrange(80), 'Porto Alegre', '9%04d-000' % rnd.randrange(10000),
+             'Rio Grande do Sul', 'Brasil'] for _ in range(rows)]
+
+
+def per_row_commit(connection, addresses):
+    """Rotina original (dataentry): um INSERT seguido de commit para cada endereço."""
+    c = connection.cursor()
+    for addr in addresses:
+        c.execute('INSERT INTO addresses (latitude, longitude, rua, numero, bairro, cidade, cep, estado, pais) \
+                  VALUES (?,?,?,?,?,?,?,?,?)', addr)
+        connection.commit()
+
+
+def batched(connection, addresses):
+    """Escrita com o batchWriter, como feita pela thread consumidora."""
+    writer = batchWriter(connection)
+    for addr in addresses:
+        writer.add(addr)
+    writer.close()
+
+
+def run(name, write, addresses, directory, **pragmas):
+    """Executa uma estratégia de escrita em um banco novo e retorna as linhas por segundo."""
+    path = os.path.join(directory, name + '.db')
+    connection = sqlite3.connect(path)
+    configure_database(connection, **pragmas)
+    create_table(connection.cursor())
+    start = time.perf_counter()
+    write(connection, addresses)
+    elapsed = time.perf_counter() - start
+    assert connection.execute('SELECT COUNT(*) FROM addresses').fetchone()[0] == len(addresses)
+    connection.close()
+    rate = len(addresses)/elapsed
+    print('%-28s %10.0f linhas/s  (%.2f s)' % (name, rate, elapsed))
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da escrita dos endereços no banco de dados.')
+    parser.add_argument('--rows', type=int, default=100000, help='quantidade de endereços sintéticos (padrão: 100000)')
+    parser.add_argument('--dir', help='diretório dos bancos temporários (padrão: diretório temporário do sistema)')
+    args = parser.parse_args()
+
+    addresses = synthetic_addresses(args.rows)
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        before = run('commit_por_linha', per_row_commit, addresses, directory)
+        after = run('batch', batched, addresses, directory)
+        after_wal = run('batch_wal_normal', batched, addresses, directory, wal=True, synchronous='NORMAL')
+    print('ganho: %.1fx (batch), %.1fx (batch + WAL)' % (after/before, after_wal/before))
+
+
+if __name__ == '__main__':
+    main()
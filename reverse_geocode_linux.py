@@ -33,6 +33,18 @@
 # **threading** - Possibilita a utilização de threads;
 # **queue** - Utilizado em conjunto com as threads, possui internamente mecanismos para "lockar" estruturas durante a execução das threads, utilizando filas;
 # **time** - Utilização de sleeps nas threads, caso necessário;
+# **json** - Serialização do retorno da API para o cache de endereços;
+# **argparse** - Parametrização da execução por linha de comando;
+# **csv** - Leitura da base de referência do provedor offline;
+# **math** - Cálculo de distâncias no provedor offline;
+# **sys**, **os** e **glob** - Leitura da entrada padrão e de padrões de nomes de arquivos;
+# **mmap** e **numpy** - Leitura rápida e vetorizada dos arquivos texto (--fast-parse, NumPy opcional);
+# **collections** - Grupos de coordenadas já resolvidos (LRU) na deduplicação;
+# **zlib** - Distribuição dos endereços entre os bancos de partição (crc32 do geohash);
+# **random** e **heapq** - Backoff com jitter e fila de novas tentativas das requisições que falharam;
+# **asyncio** - Modo assíncrono de requisições, com o adaptador aiohttp do geopy (AioHTTPAdapter);
+# **concurrent.futures** - Modo multiprocesso da leitura e do tratamento dos endereços (ProcessPoolExecutor);
+# **http.server** - Endpoint das métricas no formato do Prometheus (--metrics-port);
 # **GoogleV3** - Provedor 1 (API);
 
 import geopy  
@@ -40,8 +52,30 @@ import sqlite3
 import threading 
 import queue 
 import time
+import json
+import argparse
+import csv
+import math
+import asyncio
+import random
+import heapq
+import concurrent.futures
+import http.server
+import inspect
+import sys
+import os
+import glob
+import collections
+import zlib
+import mmap
+try:
+    import numpy as np # opcional: utilizado apenas na leitura rápida (--fast-parse)
+except ImportError:
+    np = None
 import geopy.geocoders
+import geopy.exc
 from geopy.geocoders import GoogleV3
+from geopy.location import Location
 
 
 # ### Conexão API - Definição do geolocator
@@ -52,34 +86,252 @@ from geopy.geocoders import GoogleV3
 # A chave de API do GoogleV3 pode ser modificada na célula abaixo, ou pode ser utilizada esta mesma chave, até alcançar seu limite.
 
 #Definição do geolocator
-geolocator = GoogleV3(api_key = 'USER_API_KEY - CHANGE HERE', timeout = None)
+geolocator = GoogleV3(api_key = 'USER_API_KEY - CHANGE HERE', timeout = 10) # timeout finito: uma requisição presa vira nova tentativa
 reverse = geolocator.reverse
 
+
+# ### Provedor offline
+#    Para cargas grandes (backfills), uma requisição HTTP por ponto não cabe na cota da API. O provedor offline carrega uma base local de
+#    referência (pontos de endereço ou segmentos de rua, em CSV ou GeoJSON) em um índice espacial em memória, uma grade regular de células
+#    em graus, e responde a consulta do endereço mais próximo sem nenhum acesso à rede. O método reverse tem a mesma assinatura do reverse
+#    do geopy e retorna um Location com o 'address_components' no formato do GoogleV3, assim a função getAddr não precisa ser alterada.
+#    O provedor é escolhido a cada execução pelo parâmetro --provider.
+
+# Tipos do GoogleV3 correspondentes a cada coluna da tabela addresses
+OFFLINE_FIELDS = (('rua', 'route'), ('numero', 'street_number'), ('bairro', 'sublocality'),
+                  ('cidade', 'administrative_area_level_2'), ('cep', 'postal_code'),
+                  ('estado', 'administrative_area_level_1'), ('pais', 'country'))
+
+class offlineGeocoder:
+    """Provedor de geocodificação reversa local, baseado em uma grade espacial.
+
+    A base de referência é um arquivo CSV com as colunas latitude e longitude e as mesmas colunas de endereço da tabela
+    addresses (rua, numero, bairro, cidade, cep, estado, pais), ou um arquivo GeoJSON cujas features possuem essas colunas
+    em "properties". Em features do tipo LineString e MultiLineString (ruas), cada segmento entre dois vértices consecutivos
+    é indexado com as propriedades da feature, e a distância é medida até o ponto mais próximo do segmento, que é o ponto
+    retornado. Os segmentos são divididos em trechos de no máximo uma célula, cada um registrado nas células que o seu 
+    retângulo toca; uma rua longa ocupa memória proporcional ao seu comprimento.
+    """
+    def __init__(self, path, cell_size=None):
+        """Construtor da classe offlineGeocoder.
+
+        Args:
+            path (str): Arquivo de referência (.csv, .json ou .geojson).
+            cell_size (float): Tamanho de cada célula da grade, em graus (0.01 ~ 1 km). None calcula o tamanho a partir da
+            densidade da base, para que cada célula tenha em média POINTS_PER_CELL pontos. Nunca é menor que MIN_CELL_SIZE.
+        """
+        self.points = [] # tuplas (lat, lon, raw), onde raw está no formato retornado pelo GoogleV3
+        self.lines = [] # tuplas (lat1, lon1, lat2, lon2, raw) dos segmentos de rua, divididos em trechos por build_index
+        if path.endswith('.json') or path.endswith('.geojson'):
+            self.load_geojson(path)
+        else:
+            self.load_csv(path)
+        if not self.points and not self.lines:
+            raise ValueError('Base de referência vazia: %s' % path)
+        self.build_index(cell_size)
+
+    POINTS_PER_CELL = 4
+    MIN_CELL_SIZE = 1e-4 # ~11 m: evita uma grade de células minúsculas quando os pontos da base coincidem
+
+    def build_index(self, cell_size=None):
+        """Monta a grade espacial a partir dos pontos carregados.
+
+        Os segmentos de rua entram no cálculo da densidade pelos seus vértices. Depois, cada segmento é dividido em 
+        trechos que avançam no máximo uma célula em cada eixo, e cada trecho é registrado nas (até quatro) células que o 
+        seu retângulo toca. Assim, o ponto do trecho mais próximo de uma coordenada está sempre em uma célula em que ele 
+        foi registrado, e a busca em anéis do método nearest continua correta.
+
+        Args:
+            cell_size (float): Tamanho de cada célula, em graus. None calcula a partir da densidade da base.
+        """
+        if not cell_size:
+            vertices = [point[:2] for point in self.points] + [line[:2] for line in self.lines] + [line[2:4] for line in self.lines]
+            lats = [vertex[0] for vertex in vertices]
+            lons = [vertex[1] for vertex in vertices]
+            area = max(max(lats) - min(lats), 1e-6)*max(max(lons) - min(lons), 1e-6)
+            cell_size = math.sqrt(area*self.POINTS_PER_CELL/len(vertices))
+        self.cell_size = max(cell_size, self.MIN_CELL_SIZE)
+        self.grid = {} # (linha, coluna) -> lista de índices em self.points
+        for index, point in enumerate(self.points):
+            self.grid.setdefault(self.cell(point[0], point[1]), []).append(index)
+        self.segments = [] # trechos (lat1, lon1, lat2, lon2, raw) de no máximo uma célula
+        self.segment_grid = {} # (linha, coluna) -> lista de índices em self.segments
+        for lat1, lon1, lat2, lon2, raw in self.lines:
+            steps = max(1, int(math.ceil(max(abs(lat2 - lat1), abs(lon2 - lon1))/self.cell_size)))
+            for step in range(steps):
+                start, end = step/steps, (step + 1)/steps
+                segment = (lat1 + (lat2 - lat1)*start, lon1 + (lon2 - lon1)*start,
+                           lat1 + (lat2 - lat1)*end, lon1 + (lon2 - lon1)*end, raw)
+                first_row, first_col = self.cell(min(segment[0], segment[2]), min(segment[1], segment[3]))
+                last_row, last_col = self.cell(max(segment[0], segment[2]), max(segment[1], segment[3]))
+                for i in range(first_row, last_row + 1):
+                    for j in range(first_col, last_col + 1):
+                        self.segment_grid.setdefault((i, j), []).append(len(self.segments))
+                self.segments.append(segment)
+        rows = [cell[0] for cell in self.grid] + [cell[0] for cell in self.segment_grid]
+        cols = [cell[1] for cell in self.grid] + [cell[1] for cell in self.segment_grid]
+        self.bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def cell(self, lat, lon):
+        """Retorna a célula (linha, coluna) da grade que contém a coordenada."""
+        return (int(math.floor(lat/self.cell_size)), int(math.floor(lon/self.cell_size)))
+
+    @staticmethod
+    def address(lat, lon, fields):
+        """Monta o endereço no formato retornado pelo GoogleV3 (raw) a partir das colunas de endereço."""
+        components = [{'long_name': fields[name], 'short_name': fields[name], 'types': [kind]}
+                      for name, kind in OFFLINE_FIELDS if fields.get(name)]
+        return {'address_components': components,
+                'formatted_address': ', '.join(component['long_name'] for component in components),
+                'geometry': {'location': {'lat': lat, 'lng': lon}}}
+
+    def add(self, lat, lon, fields):
+        """Adiciona um ponto de referência à base. O índice é montado depois, pelo método build_index.
+
+        Args:
+            lat (float): Latitude do ponto.
+            lon (float): Longitude do ponto.
+            fields (dict): Colunas de endereço do ponto (rua, numero, bairro, ...).
+        """
+        self.points.append((lat, lon, self.address(lat, lon, fields)))
+
+    def add_line(self, lat1, lon1, lat2, lon2, fields):
+        """Adiciona um segmento de rua à base. O índice é montado depois, pelo método build_index.
+
+        Args:
+            lat1, lon1, lat2, lon2 (float): Vértices do segmento.
+            fields (dict): Colunas de endereço da rua (rua, bairro, cidade, ...).
+        """
+        self.lines.append((lat1, lon1, lat2, lon2, self.address(lat1, lon1, fields)))
+
+    def load_csv(self, path):
+        """Carrega pontos de endereço de um arquivo CSV."""
+        with open(path, newline='', encoding='utf-8') as arquivo:
+            for row in csv.DictReader(arquivo):
+                self.add(float(row['latitude']), float(row['longitude']), row)
+
+    def load_geojson(self, path):
+        """Carrega pontos de endereço ou segmentos de rua de um arquivo GeoJSON."""
+        with open(path, encoding='utf-8') as arquivo:
+            features = json.load(arquivo)['features']
+        for feature in features:
+            geometry = feature['geometry']
+            properties = feature.get('properties') or {}
+            if geometry['type'] == 'Point':
+                vertex = geometry['coordinates']
+                self.add(float(vertex[1]), float(vertex[0]), properties) # GeoJSON usa a ordem (lon, lat)
+                continue
+            elif geometry['type'] == 'LineString':
+                lines = [geometry['coordinates']]
+            elif geometry['type'] == 'MultiLineString':
+                lines = geometry['coordinates']
+            else:
+                continue
+            for line in lines:
+                vertices = [(float(vertex[1]), float(vertex[0])) for vertex in line]
+                if len(vertices) == 1:
+                    self.add(vertices[0][0], vertices[0][1], properties)
+                for start, end in zip(vertices, vertices[1:]):
+                    self.add_line(start[0], start[1], end[0], end[1], properties)
+
+    def nearest(self, lat, lon):
+        """Busca o ponto de referência mais próximo de uma coordenada.
+
+        As células são visitadas em anéis concêntricos a partir da célula da coordenada. A busca termina quando nenhum ponto
+        de um anel mais externo pode estar mais próximo do que o melhor ponto já encontrado. Apenas as células dentro dos 
+        limites da base (self.bounds) são visitadas: os anéis que estão inteiramente fora deles são pulados, assim o custo 
+        de uma coordenada distante da base não cresce com a distância. Nas células com trechos de rua, a distância é 
+        medida até a projeção da coordenada sobre o trecho.
+
+        Returns:
+            Uma tupla (lat, lon, raw) do ponto mais próximo. Para um trecho de rua, o ponto é a projeção da coordenada.
+        """
+        row, col = self.cell(lat, lon)
+        scale = math.cos(math.radians(lat)) # distância equiretangular: corrige a longitude pela latitude
+        min_row, max_row, min_col, max_col = self.bounds
+        first_ring = max(0, min_row - row, row - max_row, min_col - col, col - max_col) # primeiro anel que toca os limites
+        max_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col)) # cobre todos os limites
+        best = None
+        best_dist = float('inf')
+        segment_cells = self.segment_grid.get if self.segment_grid else None # bases só de pontos não consultam os trechos
+        for ring in range(first_ring, max_ring + 1):
+            if best is not None and math.sqrt(best_dist) <= (ring - 1)*self.cell_size*scale:
+                break
+            for i in range(max(row - ring, min_row), min(row + ring, max_row) + 1):
+                if abs(i - row) == ring: # linha da borda do anel: todas as colunas dentro dos limites
+                    cols = range(max(col - ring, min_col), min(col + ring, max_col) + 1)
+                else: # linhas internas do anel: apenas as colunas das bordas
+                    cols = [j for j in {col - ring, col + ring} if min_col <= j <= max_col]
+                for j in cols:
+                    for index in self.grid.get((i, j), ()):
+                        point = self.points[index]
+                        dlat = point[0] - lat
+                        dlon = (point[1] - lon)*scale
+                        dist = dlat*dlat + dlon*dlon
+                        if dist < best_dist:
+                            best, best_dist, projected = point, dist, False
+                    if segment_cells is None:
+                        continue
+                    for index in segment_cells((i, j), ()):
+                        lat1, lon1, lat2, lon2, raw = self.segments[index]
+                        dlat, dlon = lat2 - lat1, (lon2 - lon1)*scale
+                        length = dlat*dlat + dlon*dlon
+                        t = ((lat - lat1)*dlat + (lon - lon1)*scale*dlon)/length if length else 0.0
+                        t = min(1.0, max(0.0, t)) # projeção limitada ao trecho
+                        elat = lat1 + dlat*t - lat
+                        elon = (lon1 - lon)*scale + dlon*t
+                        dist = elat*elat + elon*elon
+                        if dist < best_dist:
+                            best, best_dist, projected = (lat1 + (lat2 - lat1)*t, lon1 + (lon2 - lon1)*t, raw), dist, True
+        if best is not None and projected: # o raw do trecho guarda o vértice inicial da rua: atualiza a localização
+            lat, lon, raw = best
+            best = (lat, lon, dict(raw, geometry={'location': {'lat': lat, 'lng': lon}}))
+        return best
+
+    def reverse(self, query, exactly_one=True):
+        """Geocodificação reversa local, com a mesma assinatura do reverse do geopy.
+
+        Args:
+            query (tuple): Par (lat, lon), como retornado pela função read_file.
+            exactly_one (bool): Mantido por compatibilidade. Quando False, retorna uma lista com um único Location.
+
+        Returns:
+            Objeto Location com o endereço mais próximo.
+        """
+        lat, lon, raw = self.nearest(float(query[0]), float(query[1]))
+        location = Location(raw['formatted_address'], (lat, lon), raw)
+        return location if exactly_one else [location]
+
 # ### Leitura dos arquivos texto
+#    Os arquivos são lidos de forma incremental (geradores): cada par de coordenadas é entregue assim que sua linha é lida, sem montar a lista
+#    completa em memória. A thread leitora (readerThread) coloca os pares em uma fila limitada, consumida pelas threads produtoras, o que mantém
+#    o uso de memória constante independentemente do tamanho da entrada.
+
 def read_file(archive_name):
     """Extrai pares de geometria latitude e longitude de um arquivo texto.
 
     Esta função separa cada linha de um arquivo texto individualmente pelos espaços em branco. Procura pela latitude e 
-    insere em uma variável lat, procura pela sua longitude referente e insere em uma varável lon. Posteriormente é inserido
-    em uma lista, as tuplas (lat, lon).
+    insere em uma variável lat, procura pela sua longitude referente e entrega a tupla (lat, lon). A leitura é feita sob 
+    demanda (gerador), linha a linha.
 
     Args:
-        archive_name (str): O nome do arquivo texto Ex: data_points_20180101.txt
+        archive_name (str): O nome do arquivo texto Ex: data_points_20180101.txt. '-' lê da entrada padrão (stdin).
 
-    Returns:
-        Uma lista de tuplas contendo um par de coordenadas.
+    Yields:
+        Tuplas contendo um par de coordenadas.
     example:
-        [('-30.04982864', '-51.20150245'),
-         ('-30.06761588', '-51.23976111'),
-         ('-30.05596474', '-51.17286827')]
+        ('-30.04982864', '-51.20150245'),
+        ('-30.06761588', '-51.23976111'),
+        ('-30.05596474', '-51.17286827')
     
     Note:
         Esta função trata uma anomalia recorrente nos arquivos textos em que a latitude ou a longitude vem sozinha. 
-        Para isso, ao fazer a inserção - lat_lon.append((lat,lon)) - somente quando acha a longitude, resolvemos o problema
+        Para isso, ao entregar a tupla (lat,lon) somente quando acha a longitude, resolvemos o problema
         de quando não temos a longitude e, através de uma flag, resolvemos o problema de quando não vem a latitude
     """
-    lat_lon = [] 
-    with open(archive_name) as arquivo:
+    arquivo = sys.stdin if archive_name == '-' else open(archive_name)
+    try:
+        flag = False
         for linha in arquivo:
             geometry = linha.split(' ')
             if geometry[0].find('Latitude:') != -1:
@@ -87,67 +339,348 @@ def read_file(archive_name):
                 flag = True
             elif geometry[0].find('Longitude:') != -1 and flag == True:
                 lon = geometry[4].strip()
-                lat_lon.append((lat,lon))
+                yield (lat,lon)
                 flag = False
-        arquivo.close()
-    return lat_lon
+    finally:
+        if arquivo is not sys.stdin:
+            arquivo.close()
+
+
+def read_sources(sources, fast=False, pool=None, window=1):
+    """Extrai os pares de coordenadas de vários arquivos texto, em sequência.
+
+    Args:
+        sources (list): Nomes de arquivos, padrões glob (Ex: data_points_*.txt) ou '-' para a entrada padrão.
+        fast (bool): Utiliza a leitura vetorizada (read_file_numpy) nos arquivos. A entrada padrão usa sempre read_file.
+        pool (ProcessPoolExecutor): Lê os blocos de cada arquivo em paralelo nos processos do pool (parse_range), quando 
+        fast é False. A entrada padrão é sempre lida na própria thread.
+        window (int): Quantidade máxima de blocos pendentes no pool.
+
+    Yields:
+        Tuplas (arquivo, posição, par de coordenadas), na ordem dos arquivos. "arquivo" é o caminho absoluto do arquivo
+        (ou '-') e "posição" é o índice do par dentro do arquivo, começando em 0.
+    """
+    for source in sources:
+        names = [source] if source == '-' else sorted(glob.glob(source)) or [source] # sem correspondência: erro no open (ver parse_args)
+        for name in names:
+            if name != '-':
+                name = os.path.abspath(name)
+            if pool is not None and not fast and name != '-':
+                chunks = ordered_map(pool, parse_range, file_ranges(name), window)
+                coords = (coord for pairs in chunks for coord in pairs)
+            else:
+                coords = (read_file_numpy if fast and name != '-' else read_file)(name)
+            for index, coord in enumerate(coords):
+                yield (name, index, coord)
+
+
+# ### Leitura rápida (NumPy)
+#    Para arquivos muito grandes, o split e o find linha a linha em Python são lentos. Com --fast-parse, o arquivo é mapeado em memória (mmap)
+#    e cada bloco é tratado como um array de bytes do NumPy: quebras de linha, espaços e as palavras "Latitude:"/"Longitude:" são localizadas
+#    de forma vetorizada, o quinto campo de cada linha é copiado para uma matriz de largura fixa e convertido de uma vez para float64. A regra é a mesma
+#    da função read_file: uma longitude forma par com a linha de latitude imediatamente anterior; latitudes e longitudes sozinhas são
+#    descartadas. O NumPy é necessário apenas neste modo.
+
+# Primeiros 8 bytes de cada palavra, como inteiro, para comparar 8 bytes de uma vez
+LATITUDE_WORD = int.from_bytes(b'Latitude', 'little')
+LONGITUDE_WORD = int.from_bytes(b'Longitud', 'little')
+PADDING = 64 # bytes de folga no fim de cada bloco, para que as leituras de largura fixa não passem do fim
+
+def find_keywords(data, size):
+    """Localiza as palavras "Latitude:" e "Longitude:" nos "size" primeiros bytes de um bloco com folga no fim.
+
+    Returns:
+        Uma tupla (positions, is_lat), com as posições em ordem crescente e se cada uma é de "Latitude:".
+    """
+    words = np.ndarray((len(data) - 7,), '<u8', data, 0, (1,)) # 8 bytes a partir de cada posição (leitura desalinhada)
+    candidates = np.flatnonzero(data[:size] == ord('L')) # as duas palavras começam com "L"
+    prefixes = words[candidates]
+    is_lat = (prefixes == LATITUDE_WORD) & (data[candidates + 8] == ord(':'))
+    is_lon = (prefixes == LONGITUDE_WORD) & (data[candidates + 8] == ord('e')) & (data[candidates + 9] == ord(':'))
+    keep = is_lat | is_lon
+    return candidates[keep], is_lat[keep]
+
+
+def parse_chunk_numpy(chunk):
+    """Localiza as linhas de latitude e longitude de um bloco de bytes terminado em fim de linha.
+
+    Args:
+        chunk (bytes): Bloco do arquivo.
+
+    Returns:
+        Uma tupla (is_lat, values): para cada linha de latitude ou longitude do bloco, em ordem, se é latitude e o valor.
+    """
+    size = len(chunk)
+    data = np.empty(size + PADDING, np.uint8)
+    data[:size] = np.frombuffer(chunk, np.uint8)
+    data[size:] = 10
+    newlines = np.flatnonzero(data[:size] == 10)
+    spaces = np.flatnonzero(data[:size] == 32)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [size]))
+
+    # a palavra deve estar na primeira palavra da linha (nenhum espaço entre o início da linha e a palavra)
+    positions, is_lat = find_keywords(data, size)
+    lines = np.searchsorted(newlines, positions)
+    first_space = np.searchsorted(spaces, starts[lines]) # índice, em spaces, do primeiro espaço da linha
+    first_word = np.searchsorted(spaces, positions) == first_space
+    lines, is_lat, first_space = lines[first_word], is_lat[first_word], first_space[first_word]
+    # uma linha com as duas palavras conta como latitude, como na read_file
+    order = np.lexsort((~is_lat, lines))
+    lines, is_lat, first_space = lines[order], is_lat[order], first_space[order]
+    unique = np.ones(len(lines), bool)
+    unique[1:] = lines[1:] != lines[:-1]
+    lines, is_lat, first_space = lines[unique], is_lat[unique], first_space[unique]
+
+    # o valor é a quinta palavra da linha, separando por espaços simples (geometry[4] na read_file)
+    line_end = ends[lines]
+    valid = first_space + 3 < len(spaces)
+    valid[valid] = spaces[first_space[valid] + 3] < line_end[valid]
+    lines, is_lat, first_space, line_end = lines[valid], is_lat[valid], first_space[valid], line_end[valid]
+    if len(lines) == 0:
+        return is_lat, np.zeros(0)
+    value_start = spaces[first_space + 3] + 1
+    next_space = spaces[np.minimum(first_space + 4, len(spaces) - 1)]
+    value_end = np.where((first_space + 4 < len(spaces)) & (next_space < line_end), next_space, line_end)
+
+    # copia os valores para uma matriz de largura fixa, completada com espaços, e converte tudo de uma vez
+    lengths = value_end - value_start
+    width = int(lengths.max()) + 1
+    if width <= PADDING - 8:
+        words = np.ndarray((len(data) - 7,), '<u8', data, 0, (1,))
+        window = words[value_start[:, None] + np.arange(0, width, 8)].view(np.uint8).reshape(len(lines), -1)
+    else: # valores muito longos: leitura byte a byte, limitada ao fim do bloco
+        window = data[np.minimum(value_start[:, None] + np.arange(width), len(data) - 1)]
+    window[np.arange(window.shape[1]) >= lengths[:, None]] = 32
+    window[(window == 13) | (window == 9)] = 32 # o strip() da read_file remove o \r do fim da linha
+    values = np.fromstring(window.tobytes(), sep=' ')
+    if len(values) != len(lines):
+        raise ValueError('Valor de latitude ou longitude inválido no arquivo')
+    return is_lat, values
+
+
+def parse_file_numpy(archive_name, chunk_size=64*1024*1024):
+    """Extrai os pares de latitude e longitude de um arquivo texto, de forma vetorizada, em blocos.
+
+    Args:
+        archive_name (str): O nome do arquivo texto Ex: data_points_20180101.txt
+        chunk_size (int): Tamanho aproximado, em bytes, de cada bloco processado (os blocos terminam em fim de linha).
+
+    Yields:
+        Tuplas (lats, lons) de arrays numpy.float64, um par de arrays por bloco.
+    """
+    if np is None:
+        raise RuntimeError('A leitura rápida (--fast-parse) exige o NumPy: pip install numpy')
+    with open(archive_name, 'rb') as arquivo:
+        size = os.fstat(arquivo.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            previous = None # (é latitude?, valor) da última linha do bloco anterior, para pares que cruzam blocos
+            start = 0
+            while start < size:
+                end = buffer.find(b'\n', min(start + chunk_size, size) - 1)
+                end = size if end == -1 else end + 1
+                is_lat, values = parse_chunk_numpy(buffer[start:end])
+                start = end
+                if previous is not None:
+                    is_lat = np.concatenate(([previous[0]], is_lat))
+                    values = np.concatenate(([previous[1]], values))
+                if len(values) == 0:
+                    continue
+                pair = is_lat[:-1] & ~is_lat[1:] # longitude logo após uma latitude
+                previous = (is_lat[-1], values[-1])
+                if pair.any():
+                    yield values[:-1][pair], values[1:][pair]
+
+
+def read_file_numpy(archive_name):
+    """Mesma interface da função read_file, utilizando a leitura vetorizada (parse_file_numpy).
+
+    Yields:
+        Tuplas (lat, lon) de floats.
+    """
+    for lats, lons in parse_file_numpy(archive_name):
+        yield from zip(lats.tolist(), lons.tolist())
+
+
+# ### Deduplicação de coordenadas
+#    Os arquivos possuem longas sequências de pontos praticamente iguais (um veículo parado, por exemplo), e cada um deles seria uma requisição.
+#    Entre a leitura e as requisições, os pares são agrupados: pares iguais (na precisão da chave da tabela) ou, com --snap-meters, pares que
+#    caem na mesma célula de uma grade com lado igual à tolerância informada. Apenas o primeiro par de cada grupo (o representante) é enviado
+#    às threads produtoras. Quando o endereço do representante fica pronto, ele é replicado para todos os membros do grupo, e cada membro
+#    ganha a sua própria linha na tabela addresses. Os grupos resolvidos mais recentes são mantidos em memória (LRU) para que a memória
+#    continue limitada.
+
+class coordinateGroups:
+    """Agrupamento dos pares de coordenadas, para que apenas um par de cada grupo seja geocodificado."""
+    def __init__(self, snap_meters=0, precision=6, max_groups=100000):
+        """Construtor da classe coordinateGroups.
+
+        Args:
+            snap_meters (float): Lado da célula de agrupamento, em metros. 0 agrupa apenas pares iguais.
+            precision (int): Casas decimais usadas para comparar os pares quando snap_meters é 0.
+            max_groups (int): Quantidade de grupos já resolvidos mantidos em memória.
+        """
+        self.step = snap_meters/111320.0 # tamanho da célula em graus de latitude
+        self.precision = precision
+        self.max_groups = max_groups
+        self.pending = {} # chave -> membros esperando o endereço do representante
+        self.done = collections.OrderedDict() # chave -> endereço, dos grupos já resolvidos (LRU)
+        self.lock = threading.Lock()
+        self.saved = 0 # requisições economizadas
+
+    def key(self, coord):
+        """Retorna a chave do grupo de um par de coordenadas."""
+        lat, lon = float(coord[0]), float(coord[1])
+        if not self.step:
+            return (round(lat, self.precision), round(lon, self.precision))
+        row = math.floor(lat/self.step)
+        scale = math.cos(math.radians((row + 0.5)*self.step)) # a longitude é corrigida pela latitude da linha da grade
+        return (row, math.floor(lon*scale/self.step))
+
+    def claim(self, item):
+        """Registra um item (arquivo, posição, par) lido dos arquivos.
+
+        Returns:
+            True se o item é o representante de um novo grupo e deve ser geocodificado. False se o item foi anexado a um 
+            grupo em andamento ou, caso o grupo já esteja resolvido, enviado diretamente para a fila de endereços.
+        """
+        key = self.key(item[2])
+        with self.lock:
+            if key in self.done:
+                self.done.move_to_end(key)
+                addr = self.done[key]
+            elif key in self.pending:
+                self.pending[key].append(item)
+                self.saved += 1
+                return False
+            else:
+                self.pending[key] = []
+                return True
+            self.saved += 1
+        put_addr(addr, item[2], item[0], item[1])
+        return False
+
+    def resolve(self, item, addr):
+        """Entrega o endereço do representante e de todos os membros do seu grupo para a fila de endereços.
+
+        Args:
+            item (tuple): O item (arquivo, posição, par) representante do grupo.
+            addr (addressRecord): Endereço do representante, retornado pela função getAddr.
+        """
+        key = self.key(item[2])
+        with self.lock:
+            members = self.pending.pop(key, [])
+            self.done[key] = addr
+            if len(self.done) > self.max_groups:
+                self.done.popitem(last=False)
+        for source, index, coord in [item] + members:
+            put_addr(addr, coord, source, index)
+
+    def discard(self, item):
+        """Descarta o grupo de um representante que não pôde ser geocodificado.
+
+        Returns:
+            Os membros do grupo, que também ficam sem endereço.
+        """
+        with self.lock:
+            return self.pending.pop(self.key(item[2]), [])
 
 
 # ### Tratamento do endereço retornado
+#    O 'address_components' é percorrido uma única vez: os tipos de cada componente são procurados em uma tabela (ADDRESS_COMPONENTS) que
+#    indica a posição do campo no registro de endereço e qual nome usar. O registro é uma tupla nomeada (addressRecord), compacta e leve
+#    para as filas e para o pool de processos. A função aceita o Location do geopy ou diretamente o payload bruto (dict) do GoogleV3, como o
+#    guardado no cache de endereços, sem a necessidade de construir o objeto do geopy.
+
+NO_CONTENT = 'no content returned'
+
+addressRecord = collections.namedtuple('addressRecord', ['latitude', 'longitude', 'rua', 'numero', 'bairro', 'cidade', 'cep',
+                                                         'estado', 'pais'])
+
+# Tipo do GoogleV3 -> (posição do campo no addressRecord, nome utilizado do componente)
+ADDRESS_COMPONENTS = {'route': (2, 'short_name'),
+                      'street_number': (3, 'short_name'),
+                      'sublocality': (4, 'short_name'),
+                      'administrative_area_level_2': (5, 'short_name'),
+                      'postal_code': (6, 'short_name'),
+                      'administrative_area_level_1': (7, 'short_name'),
+                      'country': (8, 'long_name')}
+
 def getAddr(location): 
-    """Trata o endereço (objeto do tipo Location) retornado pela API para inserção no banco de dados.
+    """Trata o endereço (objeto do tipo Location ou payload bruto) retornado pela API para inserção no banco de dados.
 
     Esta função trata o objeto Location para retirar somente os dados que serão inseridos no banco de dados.
 
     Args:
-        location (Objeto Location): Objeto do tipo "geopy.location.Location" retornado pela função reverse, que contém, 
-        dentre outras informações, o endereço requisitado relativo à coordenada geográfica.
+        location (Objeto Location ou dict): Objeto do tipo "geopy.location.Location" retornado pela função reverse, que contém, 
+        dentre outras informações, o endereço requisitado relativo à coordenada geográfica. Também pode ser o payload bruto 
+        (location.raw), com o 'address_components' e o 'geometry' do GoogleV3.
 
     Returns:
-        Uma lista "addr" contendo os detalhes do endereço, que será futuramente armazenado em um banco de dados.
+        Um addressRecord (tupla nomeada) contendo os detalhes do endereço, que será futuramente armazenado em um banco de dados.
     example:
-        [-30.05020045,
-         -51.20177208,
-         'Rua Monsenhor Veras',
-         '361',
-         'Santana',
-         'Porto Alegre',
-         '90610-010',
-         'Rio Grande do Sul',
-         'Brasil']
+        addressRecord(latitude=-30.05020045,
+                      longitude=-51.20177208,
+                      rua='Rua Monsenhor Veras',
+                      numero='361',
+                      bairro='Santana',
+                      cidade='Porto Alegre',
+                      cep='90610-010',
+                      estado='Rio Grande do Sul',
+                      pais='Brasil')
      
     Note:
-        Na primeira linha da função, setamos as varáveis com a string default "no content returned" apenas para fins de 
-        visualização, isso porque nem sempre o endereço relativo à coordenada retorna um número da casa ou um CEP, 
-        por exemplo. Além de existirem coordenadas localizadas em um Rio, lago, etc, nem todos os retornos possuem algumas 
-        informações que precisamos, dependendo da API, sua precisão e base de dados. 
+        Os campos começam com a string default "no content returned" apenas para fins de visualização, isso porque nem 
+        sempre o endereço relativo à coordenada retorna um número da casa ou um CEP, por exemplo. Além de existirem 
+        coordenadas localizadas em um Rio, lago, etc, nem todos os retornos possuem algumas informações que precisamos, 
+        dependendo da API, sua precisão e base de dados. Se mais de um componente tiver o mesmo tipo, vale o último.
     """
-    road = house_number = suburb = city = postcode = state = country = 'no content returned'
+    if isinstance(location, dict):
+        raw = location
+        point = raw['geometry']['location']
+        fields = [point['lat'], point['lng'], NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT]
+    else:
+        raw = location.raw
+        fields = [location.latitude, location.longitude, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT,
+                  NO_CONTENT]
 
-    for i in range(len(location.raw['address_components'])): 
-        if 'route' in location.raw['address_components'][i]['types']:
-            road = location.raw['address_components'][i]['short_name']
+    for component in raw['address_components']: 
+        for kind in component['types']:
+            target = ADDRESS_COMPONENTS.get(kind)
+            if target is not None:
+                fields[target[0]] = component[target[1]]
 
-        if 'street_number' in location.raw['address_components'][i]['types']:
-            house_number = location.raw['address_components'][i]['short_name']
+    return addressRecord._make(fields)
 
-        if 'sublocality' in location.raw['address_components'][i]['types']:
-            suburb = location.raw['address_components'][i]['short_name']
 
-        if 'administrative_area_level_2' in location.raw['address_components'][i]['types']:
-            city = location.raw['address_components'][i]['short_name']
+def empty_address(coord):
+    """Registro de endereço de uma coordenada para a qual o provedor não retornou nenhum endereço (reverse retornou None)."""
+    metrics.count('no_results')
+    return addressRecord(float(coord[0]), float(coord[1]), NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT, NO_CONTENT,
+                         NO_CONTENT)
 
-        if 'postal_code' in location.raw['address_components'][i]['types']:
-            postcode = location.raw['address_components'][i]['short_name']
 
-        if 'administrative_area_level_1' in location.raw['address_components'][i]['types']:
-            state = location.raw['address_components'][i]['short_name']
+def timed_reverse(reverse_function, coord):
+    """Chama a função reverse do provedor, registrando nas métricas a requisição, o seu tempo e os erros.
 
-        if 'country' in location.raw['address_components'][i]['types']:
-            country = location.raw['address_components'][i]['long_name']
+    Args:
+        reverse_function (function): Função reverse do provedor (GoogleV3 ou offlineGeocoder).
+        coord (tuple): Par (lat, lon), como retornado pela função read_file.
 
-    addr = [location.latitude, location.longitude, road, house_number, suburb, city, postcode, state, country]
-    return addr
+    Returns:
+        O retorno da função reverse.
+    """
+    start = time.perf_counter()
+    try:
+        return reverse_function(coord, exactly_one=True) # exactly_one=True retorna um formato com infos detalhadas
+    except Exception:
+        metrics.count('errors')
+        raise
+    finally:
+        metrics.observe('request', time.perf_counter() - start)
+        metrics.count('requests')
 
 
 # ### Banco de dados
@@ -155,30 +688,982 @@ def getAddr(location):
 # Os comandos ddl *create* e *insert*, além da conexão e criação do banco foram deixados neste arquivo e não modularizados para termos um entendimento sequencial de como foi 
 # durante o desenvolvimento.
 
-def create_table(c):
+def create_table(c, spatial=False):
     """Cria a tabela no banco de dados.
 
     Caso a tabela ainda não tenha sido criada, este procedimento criará. Apenas as colunas latitude e longitude são 
-    do tipo float, as demais colunas são do tipo string.
+    do tipo float, as demais colunas são do tipo string. As colunas lat_origem e lon_origem guardam a coordenada de 
+    entrada (arredondada) que originou o endereço e possuem um índice único, para que uma nova execução sobre os mesmos 
+    pontos atualize as linhas existentes em vez de duplicá-las. Tabelas criadas antes dessas colunas são atualizadas.
+    O índice espacial (addresses_rtree) é opcional: os triggers que o mantêm a cada insert, update e delete em addresses 
+    reduzem a vazão da escrita a cerca de um quarto, então ele só é criado quando consultado durante a carga 
+    (--reuse-meters) ou, com --spatial-index, de uma vez ao final (create_spatial_index). Depois de criado, continua 
+    sendo mantido pelos triggers nas execuções seguintes.
 
     Args:
         c (objeto cursor()): O cursor criado na função main para que possamos realizar os comandos ddl.
+        spatial (bool): Cria o índice espacial R-tree, preenchendo-o com as linhas já existentes.
     """
-    c.execute('CREATE TABLE IF NOT EXISTS addresses (latitude float, longitude float, rua string, numero string,                 bairro string, cidade string, cep string, estado string, pais string)')
-
+    c.execute('CREATE TABLE IF NOT EXISTS addresses (latitude float, longitude float, rua string, numero string,                 bairro string, cidade string, cep string, estado string, pais string, lat_origem float, lon_origem float)')
+    columns = [row[1] for row in c.execute('PRAGMA table_info(addresses)')]
+    for column in ('lat_origem', 'lon_origem'):
+        if column not in columns:
+            c.execute('ALTER TABLE addresses ADD COLUMN %s float' % column)
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS addresses_origem ON addresses (lat_origem, lon_origem)')
+    if spatial:
+        create_spatial_index(c)
 
-def dataentry(addr, c, connection):
-    """Insere os dados do endereço no banco.
 
-    Aqui é ralizado o comando INSERT para a inserção dos dados do endereço no banco de dados, na tabela addresses.
+def configure_database(connection, wal=False, synchronous=None, cache_size=None):
+    """Configura os pragmas de desempenho da conexão com o banco de dados.
 
     Args:
-        addr (list): O endereço já formatado, retornado pela função getAddr()
-        c (objeto cursor()): O cursor criado na função main para que possamos realizar os comandos ddl.
         connection (connect()): a conexão criada com o banco na função main()
+        wal (bool): Utiliza o journal mode WAL, em que leituras não bloqueiam a escrita e cada commit não reescreve o banco.
+        synchronous (str): Valor do pragma synchronous (OFF, NORMAL, FULL ou EXTRA). None mantém o padrão do SQLite.
+        cache_size (int): Valor do pragma cache_size (positivo em páginas, negativo em KiB). None mantém o padrão do SQLite.
+    """
+    if wal:
+        connection.execute('PRAGMA journal_mode=WAL')
+    if synchronous is not None:
+        connection.execute('PRAGMA synchronous=%s' % synchronous)
+    if cache_size is not None:
+        connection.execute('PRAGMA cache_size=%d' % cache_size)
+
+
+class jobProgress:
+    """Progresso da execução, por arquivo de entrada, para a retomada de execuções interrompidas (--resume).
+
+    Para cada arquivo é guardada a posição: a quantidade de pares de coordenadas iniciais do arquivo que já foram escritos 
+    no banco. Como as threads produtoras terminam fora de ordem, os pares concluídos além da posição ficam pendentes em 
+    memória até que os anteriores sejam concluídos. A posição é gravada na mesma transação dos endereços (ver batchWriter), 
+    então o banco nunca indica como processado um par cujo endereço não foi escrito.
+    Um par que falhou em definitivo também conta como concluído, para que a posição avance, e é guardado na tabela failures. 
+    Na retomada, os pares da tabela failures são geocodificados de novo, mesmo antes da posição, e saem dela ao serem escritos.
+    """
+    def __init__(self, connection):
+        """Construtor da classe jobProgress. Cria a tabela progress, caso ainda não exista, e carrega as posições salvas.
+
+        Args:
+            connection (connect()): a conexão criada com o banco na função main()
+        """
+        self.connection = connection
+        self.connection.execute('CREATE TABLE IF NOT EXISTS progress (fonte string PRIMARY KEY, posicao integer, atualizado float)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS failures (fonte string, posicao integer, latitude string, \
+                                longitude string, erro string, atualizado float, PRIMARY KEY (fonte, posicao))')
+        self.connection.commit()
+        self.offsets = dict(self.connection.execute('SELECT fonte, posicao FROM progress'))
+        self.failed = set(self.connection.execute('SELECT fonte, posicao FROM failures')) # pares refeitos na retomada
+        self.pending = {} # fonte -> posições concluídas além da posição atual
+        self.changed = set() # fontes cuja posição ainda não foi gravada
+        self.lock = threading.Lock() # com várias threads consumidoras, o progresso é compartilhado
+
+    def reset(self):
+        """Descarta o progresso salvo. Utilizado quando a execução não é uma retomada."""
+        with self.connection:
+            self.connection.execute('DELETE FROM progress')
+            self.connection.execute('DELETE FROM failures')
+        self.offsets = {}
+        self.failed = set()
+        self.pending = {}
+        self.changed = set()
+
+    def offset(self, source):
+        """Retorna a quantidade de pares iniciais do arquivo que já foram processados."""
+        return self.offsets.get(source, 0)
+
+    def processed(self, source, index):
+        """Indica se o par de posição "index" do arquivo "source" já foi processado e não precisa ser refeito na retomada."""
+        return index < self.offsets.get(source, 0) and (source, index) not in self.failed
+
+    def done(self, source, index):
+        """Marca como concluído o par de posição "index" do arquivo "source", avançando a posição do arquivo se possível.
+
+        Os pares refeitos na retomada (tabela failures) estão antes da posição salva, que não muda por eles.
+        """
+        offset = self.offsets.get(source, 0)
+        if index < offset:
+            return
+        pending = self.pending.setdefault(source, set())
+        pending.add(index)
+        while offset in pending:
+            pending.remove(offset)
+            offset += 1
+        self.offsets[source] = offset
+        self.changed.add(source)
+
+    def record(self, jobs, failures=(), commit=False):
+        """Marca como concluídos os pares (fonte, posição) de um lote e grava as novas posições.
+
+        Args:
+            jobs (list): Pares (fonte, posição) concluídos, incluindo os que falharam.
+            failures (list): Tuplas (fonte, posição, latitude, longitude, erro) dos pares que falharam em definitivo.
+            commit (bool): False grava dentro da transação já aberta na conexão (os endereços estão no mesmo banco).
+            True grava em uma transação própria, para lotes escritos em outro banco (partições).
+        """
+        with self.lock:
+            for source, index in jobs:
+                self.done(source, index)
+            if commit:
+                with self.connection:
+                    self.save(jobs, failures)
+            else:
+                self.save(jobs, failures)
+
+    def save(self, jobs=(), failures=()):
+        """Grava as posições alteradas e as falhas do lote. Deve ser chamado dentro da transação que escreve os endereços."""
+        now = time.time()
+        self.connection.executemany('INSERT INTO progress (fonte, posicao, atualizado) VALUES (?,?,?) \
+                                    ON CONFLICT (fonte) DO UPDATE SET posicao = excluded.posicao, atualizado = excluded.atualizado',
+                                    [(source, self.offsets[source], now) for source in self.changed])
+        self.changed = set()
+        failed = {(failure[0], failure[1]) for failure in failures}
+        solved = [job for job in jobs if job in self.failed and job not in failed] # falhas anteriores, agora escritas
+        if solved:
+            self.connection.executemany('DELETE FROM failures WHERE fonte = ? AND posicao = ?', solved)
+            self.failed.difference_update(solved)
+        if failures:
+            self.connection.executemany('INSERT OR REPLACE INTO failures VALUES (?,?,?,?,?,?)',
+                                        [tuple(failure) + (now,) for failure in failures])
+            self.failed.update(failed)
+
+
+class batchWriter:
+    """Escrita em lote dos endereços no banco de dados.
+
+    Fazer um INSERT seguido de commit para cada endereço obriga o SQLite a sincronizar o disco (fsync) a cada linha, o que
+    limita a velocidade da thread consumidora. Aqui os endereços são acumulados em memória e inseridos com executemany
+    dentro de uma única transação, quando o lote atinge batch_size linhas ou quando flush_interval segundos se passaram
+    desde a última escrita. O método close garante a escrita do que restou no lote.
+
+    A escrita é idempotente: cada linha leva a coordenada de entrada arredondada (lat_origem, lon_origem) e, se a coordenada 
+    já existir na tabela, a linha existente é atualizada (upsert).
+    """
+    def __init__(self, connection, batch_size=1000, flush_interval=1.0, precision=6, progress=None):
+        """Construtor da classe batchWriter.
+
+        Args:
+            connection (connect()): a conexão criada com o banco na função main()
+            batch_size (int): Quantidade de linhas que dispara a escrita do lote.
+            flush_interval (float): Tempo máximo, em segundos, que uma linha espera no lote antes de ser escrita.
+            precision (int): Casas decimais usadas para arredondar a coordenada de entrada (chave única da tabela).
+            progress (jobProgress): Progresso da execução, gravado junto com cada lote. None desabilita. Se o progresso
+            estiver em outro banco (escrita em partições), ele é gravado logo após o commit de cada lote.
+        """
+        self.connection = connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.precision = precision
+        self.progress = progress
+        self.rows = [] # lote ainda não escrito
+        self.jobs = [] # (fonte, posição) dos pares do lote, para o progresso
+        self.failures = [] # (fonte, posição, latitude, longitude, erro) dos pares do lote que falharam
+        self.written = 0 # total de linhas já escritas
+        self.last_flush = time.time()
+
+    def add(self, addr, coord=None, source=None, index=None, error=None):
+        """Adiciona um endereço ao lote, escrevendo o lote caso ele esteja cheio ou tenha expirado.
+
+        Args:
+            addr (addressRecord): O endereço já formatado, retornado pela função getAddr(). None indica um par que falhou 
+            em definitivo: nenhuma linha é escrita, mas a sua posição é concluída e a falha é guardada para a retomada.
+            coord (tuple): Par (lat, lon) de entrada que originou o endereço. None grava a linha sem chave única.
+            source (str): Arquivo de origem do par, para o progresso da execução.
+            index (int): Posição do par no arquivo de origem.
+            error (str): Motivo da falha, quando addr é None.
+        """
+        if addr is None:
+            if source is not None:
+                self.jobs.append((source, index))
+                self.failures.append((source, index, str(coord[0]), str(coord[1]), error))
+            self.flush_if_due()
+            return
+        if coord is None:
+            self.rows.append(list(addr) + [None, None])
+        else:
+            self.rows.append(list(addr) + [round(float(coord[0]), self.precision), round(float(coord[1]), self.precision)])
+        if source is not None:
+            self.jobs.append((source, index))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def time_to_flush(self):
+        """Retorna quantos segundos faltam para o lote expirar, ou None se o lote estiver vazio."""
+        if not self.rows and not self.failures:
+            return None
+        return max(0.0, self.last_flush + self.flush_interval - time.time())
+
+    def flush_if_due(self):
+        """Escreve o lote caso flush_interval segundos tenham se passado desde a última escrita."""
+        if (self.rows or self.failures) and time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    WRITE_RETRIES = 5 # novas tentativas de um lote quando o banco está bloqueado por outro processo
+
+    def flush(self):
+        """Insere (ou atualiza) todas as linhas do lote no banco, em uma única transação junto com o progresso.
+
+        Se o banco estiver bloqueado (sqlite3.OperationalError), a transação é desfeita e o lote é tentado de novo até 
+        WRITE_RETRIES vezes, com esperas crescentes; depois disso, o erro é propagado para a thread consumidora.
+        """
+        if self.rows or self.failures:
+            start = time.perf_counter()
+            for attempt in range(self.WRITE_RETRIES + 1):
+                try:
+                    self.write()
+                    break
+                except sqlite3.OperationalError as error:
+                    if attempt == self.WRITE_RETRIES:
+                        raise
+                    print('Erro na escrita do lote, nova tentativa em', 2**attempt, 's:', error)
+                    time.sleep(2**attempt)
+            metrics.observe('db_write', time.perf_counter() - start, len(self.rows))
+            metrics.count('rows_written', len(self.rows))
+            self.written += len(self.rows)
+            self.rows = []
+            self.jobs = []
+            self.failures = []
+        self.last_flush = time.time()
+
+    def write(self):
+        """Escreve o lote atual em uma transação. O lote só é descartado pelo método flush, após o commit."""
+        with self.connection: # transação explícita: commit ao final, rollback em caso de erro
+            self.connection.executemany('INSERT INTO addresses (latitude, longitude, rua, numero, bairro, cidade, cep, \
+                                        estado, pais, lat_origem, lon_origem) VALUES (?,?,?,?,?,?,?,?,?,?,?) \
+                                        ON CONFLICT (lat_origem, lon_origem) DO UPDATE SET latitude = excluded.latitude, \
+                                        longitude = excluded.longitude, rua = excluded.rua, numero = excluded.numero, \
+                                        bairro = excluded.bairro, cidade = excluded.cidade, cep = excluded.cep, \
+                                        estado = excluded.estado, pais = excluded.pais', self.rows)
+            if self.progress is not None and self.jobs and self.progress.connection is self.connection:
+                self.progress.record(self.jobs, self.failures)
+        if self.progress is not None and self.jobs and self.progress.connection is not self.connection:
+            self.progress.record(self.jobs, self.failures, commit=True) # os endereços já estão gravados na partição
+
+    def close(self):
+        """Escreve o que restou no lote. Deve ser chamado ao final da execução."""
+        self.flush()
+
+
+# ### Escrita em partições
+#    O SQLite permite apenas um escritor por banco. Com várias threads consumidoras (--consumers), cada uma escreve em um banco de partição
+#    próprio (challenge_db.shard<N>.db), com a sua própria conexão. O endereço é direcionado à partição pelo geohash da coordenada de entrada:
+#    coordenadas iguais caem sempre na mesma partição, o que mantém o upsert correto. Ao final da execução, as partições são anexadas (ATTACH)
+#    ao banco principal, copiadas com a mesma regra de upsert e removidas. Partições que sobraram de uma execução interrompida também são
+#    copiadas, então nenhum endereço gravado é perdido.
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def geohash(lat, lon, precision=6):
+    """Codifica uma coordenada em geohash.
+
+    Args:
+        lat (float): Latitude.
+        lon (float): Longitude.
+        precision (int): Quantidade de caracteres (6 caracteres ~ células de 1,2 km x 0,6 km).
+
+    Returns:
+        O geohash da coordenada (str).
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    code = []
+    bits = value = 0
+    even = True # bits pares refinam a longitude, ímpares a latitude
+    while len(code) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1])/2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            code.append(GEOHASH_BASE32[value])
+            bits = value = 0
+    return ''.join(code)
+
+
+def shard_of(coord, amount_shards, precision=6):
+    """Retorna a partição (0 a amount_shards - 1) de uma coordenada de entrada, a partir do seu geohash."""
+    if amount_shards == 1 or coord is None:
+        return 0
+    return zlib.crc32(geohash(float(coord[0]), float(coord[1]), precision).encode()) % amount_shards
+
+
+def shard_paths(database):
+    """Retorna os caminhos dos bancos de partição de um banco principal, inclusive os de execuções anteriores."""
+    root, extension = os.path.splitext(database)
+    return sorted(glob.glob(glob.escape(root) + '.shard*' + extension))
+
+
+def merge_shards(connection, paths):
+    """Copia os endereços dos bancos de partição para o banco principal e remove as partições.
+
+    Args:
+        connection (connect()): a conexão com o banco principal, criada na função main()
+        paths (list): Caminhos dos bancos de partição.
+
+    Returns:
+        A quantidade de linhas copiadas.
+    """
+    merged = 0
+    for path in paths:
+        connection.execute('ATTACH DATABASE ? AS shard', (path,))
+        try:
+            with connection:
+                cursor = connection.execute('INSERT INTO addresses (latitude, longitude, rua, numero, bairro, cidade, cep, \
+                                            estado, pais, lat_origem, lon_origem) SELECT latitude, longitude, rua, numero, \
+                                            bairro, cidade, cep, estado, pais, lat_origem, lon_origem FROM shard.addresses \
+                                            WHERE true ON CONFLICT (lat_origem, lon_origem) DO UPDATE SET \
+                                            latitude = excluded.latitude, longitude = excluded.longitude, rua = excluded.rua, \
+                                            numero = excluded.numero, bairro = excluded.bairro, cidade = excluded.cidade, \
+                                            cep = excluded.cep, estado = excluded.estado, pais = excluded.pais')
+                merged += cursor.rowcount
+        finally:
+            connection.execute('DETACH DATABASE shard')
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return merged
+
+
+# ### Consultas espaciais
+#    Depois da carga, o banco é consultado por endereços próximos de um ponto ou dentro de um retângulo. Sem índice, cada consulta percorre
+#    a tabela inteira. A tabela virtual addresses_rtree (módulo R-tree do SQLite) guarda o ponto (latitude, longitude) de cada endereço,
+#    com o rowid da linha em addresses, e é mantida por triggers, então qualquer escrita (batchWriter, merge_shards) a atualiza. Os triggers
+#    custam caro na carga, então o índice só é criado com --reuse-meters (consultado durante a carga) ou com --spatial-index, que o
+#    preenche de uma vez, com um único INSERT...SELECT, depois que todos os endereços foram gravados. A classe
+#    addressIndex faz as consultas por retângulo (bbox), por raio (radius) e dos k mais próximos (nearest). Com --reuse-meters, o mesmo
+#    índice responde, antes de cada requisição, se já existe um endereço gravado a poucos metros da coordenada (nearby), que é então
+#    reutilizado sem chamar o reverse. Os endereços gravados durante a própria execução ficam visíveis após o commit de cada lote.
+
+EARTH_RADIUS = 6371008.8 # raio médio da Terra, em metros
+METERS_PER_DEGREE = EARTH_RADIUS*math.pi/180 # metros em um grau de latitude
+MAX_DISTANCE = EARTH_RADIUS*math.pi # metade da circunferência: cobre a Terra inteira
+
+def create_spatial_index(c):
+    """Cria a tabela addresses_rtree e os triggers que a mantêm, preenchendo-a com os endereços já existentes.
+
+    Args:
+        c (objeto cursor()): Cursor de um banco que já possui a tabela addresses.
+    """
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'addresses_rtree'").fetchone()
+    c.execute('CREATE VIRTUAL TABLE IF NOT EXISTS addresses_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)')
+    c.execute('CREATE TRIGGER IF NOT EXISTS addresses_rtree_insert AFTER INSERT ON addresses WHEN new.latitude IS NOT NULL \
+              BEGIN INSERT INTO addresses_rtree VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude); END')
+    c.execute('CREATE TRIGGER IF NOT EXISTS addresses_rtree_update AFTER UPDATE OF latitude, longitude ON addresses \
+              BEGIN DELETE FROM addresses_rtree WHERE id = old.rowid; INSERT INTO addresses_rtree \
+              SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude WHERE new.latitude IS NOT NULL; END')
+    c.execute('CREATE TRIGGER IF NOT EXISTS addresses_rtree_delete AFTER DELETE ON addresses \
+              BEGIN DELETE FROM addresses_rtree WHERE id = old.rowid; END')
+    if not exists:
+        rebuild_spatial_index(c)
+
+
+def rebuild_spatial_index(c):
+    """Recria o conteúdo de addresses_rtree a partir de addresses.
+
+    Note:
+        A tabela addresses não tem uma chave primária inteira, então um VACUUM pode renumerar os rowids. Depois de um 
+        VACUUM, o índice deve ser recriado por esta função.
+    """
+    c.execute('DELETE FROM addresses_rtree')
+    c.execute('INSERT INTO addresses_rtree SELECT rowid, latitude, latitude, longitude, longitude FROM addresses \
+              WHERE latitude IS NOT NULL')
+    c.connection.commit()
+
+
+def distance_meters(lat1, lon1, lat2, lon2):
+    """Distância, em metros, entre duas coordenadas (fórmula de haversine)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
+    return 2*EARTH_RADIUS*math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, meters):
+    """Retângulo (min_lat, min_lon, max_lat, max_lon) que contém o círculo de raio "meters" em volta da coordenada.
+
+    Perto dos polos, ou se o retângulo cruzar o antimeridiano (±180°), todas as longitudes são incluídas.
+    """
+    dlat = meters/METERS_PER_DEGREE
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    scale = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    if min_lat <= -90 or max_lat >= 90 or scale <= 0:
+        return (min_lat, -180.0, max_lat, 180.0)
+    dlon = dlat/scale
+    if lon - dlon < -180 or lon + dlon > 180:
+        return (min_lat, -180.0, max_lat, 180.0)
+    return (min_lat, lon - dlon, max_lat, lon + dlon)
+
+
+class addressIndex:
+    """Consultas espaciais sobre a tabela addresses, pelo índice R-tree (addresses_rtree).
+
+    Os endereços são retornados como addressRecord, o mesmo registro da função getAddr.
+    """
+    def __init__(self, connection):
+        """Construtor da classe addressIndex.
+
+        Args:
+            connection (connect()): Conexão com um banco que possui as tabelas addresses e addresses_rtree. Pode ser 
+            compartilhada entre as threads (check_same_thread=False); as consultas são serializadas por um lock.
+        """
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def bbox(self, min_lat, min_lon, max_lat, max_lon, limit=None):
+        """Endereços cujo ponto está dentro do retângulo.
+
+        Args:
+            min_lat, min_lon, max_lat, max_lon (float): Limites do retângulo, em graus.
+            limit (int): Quantidade máxima de endereços. None retorna todos.
+
+        Returns:
+            Lista de addressRecord.
+        """
+        query = 'SELECT a.latitude, a.longitude, a.rua, a.numero, a.bairro, a.cidade, a.cep, a.estado, a.pais \
+                 FROM addresses_rtree r JOIN addresses a ON a.rowid = r.id \
+                 WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?'
+        with self.lock:
+            rows = self.connection.execute(query, (min_lat, max_lat, min_lon, max_lon)).fetchall()
+        # o R-tree guarda floats de 32 bits arredondados para fora: os limites exatos são conferidos aqui
+        records = [addressRecord._make(row) for row in rows
+                   if min_lat <= row[0] <= max_lat and min_lon <= row[1] <= max_lon]
+        return records if limit is None else records[:limit]
+
+    def radius(self, lat, lon, meters, limit=None):
+        """Endereços a até "meters" metros da coordenada, do mais próximo para o mais distante.
+
+        Returns:
+            Lista de tuplas (distância em metros, addressRecord).
+        """
+        found = []
+        for record in self.bbox(*bounding_box(lat, lon, meters)):
+            distance = distance_meters(lat, lon, record.latitude, record.longitude)
+            if distance <= meters:
+                found.append((distance, record))
+        found.sort(key=lambda entry: entry[0])
+        return found if limit is None else found[:limit]
+
+    def nearest(self, lat, lon, k=1, max_meters=None, start_meters=100):
+        """Os k endereços mais próximos da coordenada.
+
+        O raio da busca começa em start_meters e é multiplicado por 4 até que existam k endereços dentro dele (os k mais 
+        próximos estão, então, dentro do raio) ou até max_meters.
+
+        Returns:
+            Lista de até k tuplas (distância em metros, addressRecord), do mais próximo para o mais distante.
+        """
+        limit_meters = min(max_meters, MAX_DISTANCE) if max_meters is not None else MAX_DISTANCE
+        meters = min(start_meters, limit_meters)
+        while True:
+            found = self.radius(lat, lon, meters)
+            if len(found) >= k or meters >= limit_meters:
+                return found[:k]
+            meters = min(meters*4, limit_meters)
+
+    def nearby(self, coord, meters):
+        """Endereço já gravado a até "meters" metros de uma coordenada, utilizado antes de uma requisição (--reuse-meters).
+
+        Args:
+            coord (tuple): Par (lat, lon), como retornado pela função read_file.
+            meters (float): Distância máxima, em metros.
+
+        Returns:
+            O addressRecord mais próximo, ou None se não houver endereço gravado dentro da distância.
+        """
+        found = self.nearest(float(coord[0]), float(coord[1]), 1, meters, meters)
+        return found[0][1] if found else None
+
+
+# ### Cache de endereços
+#    Cada requisição ao GoogleV3 consome a cota paga da API e um round trip de rede. Como os mesmos pontos se repetem entre os arquivos
+#    (e até dentro de um mesmo arquivo), o retorno da API é guardado em um banco SQLite separado ("cache_db.db"), indexado pelas coordenadas
+#    arredondadas em uma precisão configurável. Antes de chamar o reverse, a thread produtora consulta o cache. As entradas expiram após um
+#    TTL e, ao atingir o tamanho máximo, as entradas acessadas há mais tempo são descartadas (LRU). O momento do último acesso de cada acerto
+#    fica em memória e é gravado em lote (no próximo put, a cada ACCESS_FLUSH_SIZE acertos ou ACCESS_FLUSH_INTERVAL segundos), para que um
+#    acerto não custe um commit (fsync) no banco.
+
+class addressCache:
+    """Cache persistente dos retornos da API, indexado por coordenadas normalizadas.
+
+    Guarda o payload bruto ("raw", que contém o 'address_components') de cada Location retornado pelo reverse. Em um acerto,
+    o payload é devolvido como dict, que a função getAddr trata diretamente, sem reconstruir o objeto Location.
+    """
+    ACCESS_FLUSH_SIZE = 1000 # acertos acumulados em memória antes de gravar os acessos
+    ACCESS_FLUSH_INTERVAL = 5.0 # segundos máximos entre duas gravações dos acessos
+
+    def __init__(self, path='cache_db.db', precision=5, ttl=30*24*3600, max_entries=100000):
+        """Construtor da classe addressCache.
+
+        Args:
+            path (str): Caminho do banco de dados SQLite do cache.
+            precision (int): Quantidade de casas decimais usadas para normalizar as coordenadas (5 casas ~ 1 metro).
+            ttl (float): Tempo de vida de cada entrada, em segundos. None ou 0 desabilita a expiração.
+            max_entries (int): Quantidade máxima de entradas. Ao ultrapassar, as menos acessadas recentemente são removidas.
+        """
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0 # acertos no cache
+        self.misses = 0 # falhas (coordenadas que precisaram ir até a API)
+        self.accessed = {} # chave -> momento do último acesso, ainda não gravado no banco
+        self.flushed = time.monotonic() # momento da última gravação dos acessos
+        self.lock = threading.Lock() # a mesma conexão é compartilhada entre as threads produtoras
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('BEGIN IMMEDIATE') # os processos do pool abrem o mesmo cache ao mesmo tempo
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cache (lat_key text, lon_key text, address text, latitude float, \
+                                longitude float, raw text, created float, accessed float, PRIMARY KEY (lat_key, lon_key))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        # quantidade de entradas, mantida por triggers: compartilhada entre todas as conexões (processos) do mesmo cache
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cache_size (size integer)')
+        if self.connection.execute('SELECT COUNT(*) FROM cache_size').fetchone()[0] == 0:
+            self.connection.execute('INSERT INTO cache_size SELECT COUNT(*) FROM cache')
+        self.connection.execute('CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache \
+                                BEGIN UPDATE cache_size SET size = size + 1; END')
+        self.connection.execute('CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache \
+                                BEGIN UPDATE cache_size SET size = size - 1; END')
+        self.connection.commit()
+
+    def key(self, coord):
+        """Normaliza um par (lat, lon) para a chave do cache, de acordo com a precisão configurada."""
+        return tuple('%.*f' % (self.precision, float(value)) for value in coord)
+
+    def get(self, coord):
+        """Busca no cache o endereço de uma coordenada.
+
+        Args:
+            coord (tuple): Par (lat, lon), como retornado pela função read_file.
+
+        Returns:
+            O payload bruto (dict) guardado no cache, ou None caso a coordenada não esteja no cache ou tenha expirado.
+        """
+        lat_key, lon_key = self.key(coord)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute('SELECT raw, created FROM cache WHERE lat_key = ? AND lon_key = ?',
+                                          (lat_key, lon_key)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                self.connection.execute('DELETE FROM cache WHERE lat_key = ? AND lon_key = ?', (lat_key, lon_key))
+                self.connection.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.accessed[(lat_key, lon_key)] = now # gravado em lote, sem um commit por acerto
+            self.hits += 1
+            if len(self.accessed) >= self.ACCESS_FLUSH_SIZE or time.monotonic() - self.flushed >= self.ACCESS_FLUSH_INTERVAL:
+                self.write_accessed()
+                self.connection.commit()
+        return json.loads(row[0])
+
+    def write_accessed(self):
+        """Grava os acessos acumulados em memória na transação atual. Deve ser chamado com o lock adquirido."""
+        if self.accessed:
+            self.connection.executemany('UPDATE cache SET accessed = ? WHERE lat_key = ? AND lon_key = ?',
+                                        [(accessed, lat_key, lon_key) for (lat_key, lon_key), accessed in self.accessed.items()])
+            self.accessed.clear()
+        self.flushed = time.monotonic()
+
+    def flush(self):
+        """Grava no banco os acessos acumulados em memória."""
+        with self.lock:
+            if self.accessed:
+                self.write_accessed()
+                self.connection.commit()
+
+    def put(self, coord, location):
+        """Adiciona ao cache o retorno da API para uma coordenada, removendo as entradas mais antigas caso o limite seja atingido.
+
+        Args:
+            coord (tuple): Par (lat, lon) utilizado na requisição.
+            location (Objeto Location): Retorno da função reverse.
+        """
+        if location is None:
+            return
+        lat_key, lon_key = self.key(coord)
+        now = time.time()
+        with self.lock:
+            self.write_accessed() # a ordem LRU do descarte considera os acertos recentes; mesmo commit do insert
+            self.connection.execute('INSERT OR IGNORE INTO cache VALUES (?,?,?,?,?,?,?,?)', (lat_key, lon_key,
+                                    location.address, location.latitude, location.longitude, json.dumps(location.raw), now, now))
+            # o insert abriu a transação de escrita: o tamanho lido inclui as entradas de todos os processos
+            size = self.connection.execute('SELECT size FROM cache_size').fetchone()[0]
+            if self.max_entries and size > self.max_entries:
+                self.connection.execute('DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY accessed LIMIT ?)',
+                                        (size - self.max_entries,))
+            self.connection.commit()
+
+    def close(self):
+        """Grava os acessos pendentes e fecha a conexão com o banco do cache."""
+        self.flush()
+        self.connection.close()
+
+
+# ### Métricas
+#    Em vez de um print a cada requisição e a cada escrita (que disputam o lock do stdout e não dizem onde o tempo é gasto), as etapas
+#    registram as suas medidas no objeto global "metrics": tempos por etapa (parse, request, normalize, queue_wait e db_write), contadores
+#    (requisições, erros, novas tentativas, acertos e falhas do cache, linhas gravadas) e a profundidade das filas, lida apenas no momento do
+#    relatório. Cada registro é uma soma protegida por um lock, barata o bastante para ficar sempre ligada; os laços mais quentes (leitura)
+#    acumulam localmente e registram em blocos. A thread metricsReporter imprime uma linha de resumo periódica (--metrics-interval) e
+#    exporta as métricas no formato texto do Prometheus, em um arquivo (--metrics-file) e/ou em um endpoint HTTP (--metrics-port).
+
+METRIC_STAGES = ('parse', 'request', 'normalize', 'queue_wait', 'db_write')
+METRIC_COUNTERS = ('coords_read', 'requests', 'errors', 'retries', 'failed', 'throttled', 'breaker_opened', 'no_results',
+                   'cache_hits', 'cache_misses', 'reused', 'rows_written')
+
+class runtimeMetrics:
+    """Contadores, tempos por etapa e medidores (gauges) da execução, compartilhados entre as threads."""
+    def __init__(self):
+        """Construtor da classe runtimeMetrics."""
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(METRIC_COUNTERS, 0)
+        self.stages = {stage: [0, 0.0] for stage in METRIC_STAGES} # etapa -> [ocorrências, segundos]
+        self.gauges = {} # nome -> função sem argumentos que retorna o valor atual
+        self.started = time.time()
+
+    def count(self, name, amount=1):
+        """Soma "amount" ao contador "name"."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, stage, seconds, amount=1):
+        """Registra "amount" ocorrências da etapa "stage", que levaram "seconds" segundos no total."""
+        with self.lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += amount
+            entry[1] += seconds
+
+    def gauge(self, name, function):
+        """Registra um medidor, cujo valor é lido (chamando "function") apenas no momento do relatório."""
+        self.gauges[name] = function
+
+    def snapshot(self):
+        """Retorna uma cópia dos contadores e dos tempos por etapa, que pode ser enviada entre processos e somada (merge)."""
+        with self.lock:
+            return {'counters': dict(self.counters), 'stages': {stage: list(entry) for stage, entry in self.stages.items()}}
+
+    def merge(self, snapshot):
+        """Soma as medidas de um snapshot (Ex: de um processo do pool) às medidas deste objeto."""
+        with self.lock:
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for stage, (amount, seconds) in snapshot['stages'].items():
+                entry = self.stages.setdefault(stage, [0, 0.0])
+                entry[0] += amount
+                entry[1] += seconds
+
+    def read_gauges(self):
+        """Lê o valor atual de cada medidor."""
+        return {name: function() for name, function in self.gauges.items()}
+
+    def summary(self, previous=None, interval=None):
+        """Monta a linha de resumo: totais, taxas no último intervalo, profundidade das filas e tempo médio de cada etapa.
+
+        Args:
+            previous (dict): Snapshot do relatório anterior, para calcular as taxas do intervalo. None utiliza o início.
+            interval (float): Segundos desde o snapshot anterior. None utiliza o tempo desde o início.
+        """
+        current = self.snapshot()
+        counters = current['counters']
+        before = previous['counters'] if previous else dict.fromkeys(counters, 0)
+        interval = interval or max(time.time() - self.started, 1e-9)
+        parts = ['%.0fs' % (time.time() - self.started)]
+        for name in ('coords_read', 'requests', 'rows_written'):
+            parts.append('%s=%d (%.1f/s)' % (name, counters.get(name, 0), (counters.get(name, 0) - before.get(name, 0))/interval))
+        for name in ('errors', 'retries', 'failed', 'throttled', 'cache_hits', 'cache_misses', 'reused'):
+            parts.append('%s=%d' % (name, counters.get(name, 0)))
+        parts.append(' '.join('%s=%d' % item for item in self.read_gauges().items()))
+        parts.append('ms/item ' + ' '.join('%s=%.3f' % (stage, 1000*seconds/amount)
+                                            for stage, (amount, seconds) in current['stages'].items() if amount))
+        return '[métricas] ' + ' | '.join(part for part in parts if part)
+
+    def prometheus(self):
+        """Exporta as métricas no formato texto do Prometheus."""
+        current = self.snapshot()
+        lines = []
+        for name, value in sorted(current['counters'].items()):
+            lines += ['# TYPE geocode_%s_total counter' % name, 'geocode_%s_total %d' % (name, value)]
+        lines.append('# TYPE geocode_stage_seconds_total counter')
+        lines += ['geocode_stage_seconds_total{stage="%s"} %.6f' % (stage, entry[1]) for stage, entry in current['stages'].items()]
+        lines.append('# TYPE geocode_stage_count_total counter')
+        lines += ['geocode_stage_count_total{stage="%s"} %d' % (stage, entry[0]) for stage, entry in current['stages'].items()]
+        lines.append('# TYPE geocode_queue_depth gauge')
+        lines += ['geocode_queue_depth{queue="%s"} %d' % item for item in self.read_gauges().items()]
+        lines.append('# TYPE geocode_uptime_seconds gauge')
+        lines.append('geocode_uptime_seconds %.3f' % (time.time() - self.started))
+        return '\n'.join(lines) + '\n'
+
+metrics = runtimeMetrics() # métricas globais da execução, utilizadas por todas as etapas
+
+
+class metricsHandler(http.server.BaseHTTPRequestHandler):
+    """Endpoint HTTP (GET /metrics) das métricas no formato texto do Prometheus."""
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        data = metrics.prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class metricsReporter(threading.Thread):
+    """Thread que imprime o resumo periódico das métricas e exporta o arquivo do Prometheus.
+
+    Classe da Thread de métricas, atributos e parâmetros descritos no método _init_.
+    """
+    def __init__(self, interval=10, path=None, port=None):
+        """Construtor da classe metricsReporter.
+
+        Note:
+            Os atributos possuem o mesmo nome dos argumentos. Os que não possuirem estão comentados em linha
+
+        Args:
+            interval (float): Segundos entre os relatórios. 0 desabilita a linha de resumo periódica.
+            path (str): Arquivo texto do Prometheus, reescrito a cada relatório. None desabilita.
+            port (int): Porta do endpoint HTTP /metrics. None desabilita.
+        """
+        self.interval = interval
+        self.path = path
+        self.port = port
+        self.stopped = threading.Event() # sinaliza o fim da execução
+        self.server = None # servidor HTTP do endpoint
+        threading.Thread.__init__(self, daemon=True)
+
+    def export(self):
+        """Reescreve o arquivo do Prometheus de forma atômica (o leitor nunca vê um arquivo pela metade)."""
+        if self.path:
+            with open(self.path + '.tmp', 'w') as arquivo:
+                arquivo.write(metrics.prometheus())
+            os.replace(self.path + '.tmp', self.path)
+
+    def run(self):
+        """Relata as métricas a cada "interval" segundos, até o método stop ser chamado."""
+        if self.port is not None:
+            self.server = http.server.ThreadingHTTPServer(('', self.port), metricsHandler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        previous, last = metrics.snapshot(), time.time()
+        while not self.stopped.wait(self.interval or 1.0):
+            if self.interval:
+                now = time.time()
+                print(metrics.summary(previous, now - last))
+                previous, last = metrics.snapshot(), now
+            self.export()
+
+    def stop(self):
+        """Finaliza a thread, imprimindo o resumo final e exportando as métricas uma última vez."""
+        self.stopped.set()
+        self.join()
+        print(metrics.summary())
+        self.export()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+# ### Requisições resilientes
+#    Uma exceção no reverse (limite de requisições, timeout, erro 5xx) terminava a thread produtora e as suas coordenadas eram perdidas; um
+#    retorno None (nenhum endereço para a coordenada) quebrava a função getAddr. As requisições ao GoogleV3 agora têm timeout finito
+#    (--request-timeout) e os erros são classificados (classify_error): limites do provedor (429, OVER_QUERY_LIMIT) e falhas transitórias
+#    (timeout, indisponibilidade, 5xx) são tentados novamente após um backoff exponencial com jitter (retryPolicy); os demais erros e as
+#    coordenadas que esgotaram as tentativas são descartados e contados (failed). A posição de retomada continua avançando sobre eles, e o
+#    par vai para a tabela failures, de onde uma retomada (--resume) o refaz (ver give_up e jobProgress).
+#    No modo threads, a coordenada que falhou volta para uma fila de novas tentativas (retryQueue), atendida por qualquer thread produtora,
+#    assim nenhuma thread fica parada esperando o backoff. O disjuntor (circuitBreaker) controla o balde de fichas global: cada limite do
+#    provedor reduz a taxa pela metade e, depois de vários limites seguidos, pausa todas as requisições; cada sucesso devolve aos poucos a
+#    taxa até o máximo (--rate), mantendo a execução na maior velocidade que o provedor sustenta.
+
+THROTTLE_ERRORS = (geopy.exc.GeocoderRateLimited, geopy.exc.GeocoderQuotaExceeded)
+TRANSIENT_ERRORS = (geopy.exc.GeocoderTimedOut, geopy.exc.GeocoderUnavailable)
+
+def classify_error(error):
+    """Classifica uma exceção do reverse.
+
+    Returns:
+        'throttle' para os limites do provedor, 'transient' para falhas temporárias (timeout, indisponibilidade e erros 5xx, 
+        que o geopy entrega como GeocoderServiceError) e None para os erros que não adianta tentar de novo (Ex: chave inválida).
+    """
+    if isinstance(error, THROTTLE_ERRORS):
+        return 'throttle'
+    if isinstance(error, TRANSIENT_ERRORS) or type(error) is geopy.exc.GeocoderServiceError:
+        return 'transient'
+    return None
+
+
+class retryPolicy:
+    """Quantidade de tentativas e espera (backoff exponencial com jitter) entre as tentativas de uma coordenada."""
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=30.0):
+        """Construtor da classe retryPolicy.
+
+        Args:
+            max_attempts (int): Quantidade máxima de tentativas de cada coordenada, incluindo a primeira.
+            base_delay (float): Espera máxima, em segundos, antes da segunda tentativa. Dobra a cada nova falha.
+            max_delay (float): Limite da espera, em segundos.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def retryable(self, error, attempt):
+        """Indica se a coordenada que falhou na tentativa "attempt" (começando em 0) deve ser tentada novamente."""
+        return classify_error(error) is not None and attempt + 1 < self.max_attempts
+
+    def delay(self, attempt, error=None):
+        """Espera antes da próxima tentativa: sorteada entre 0 e base_delay*2^attempt (full jitter), respeitando o Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay*2**attempt))
+        return max(delay, getattr(error, 'retry_after', None) or 0)
+
+
+class circuitBreaker:
+    """Disjuntor que ajusta a taxa global de requisições (tokenBucket) de acordo com as respostas do provedor.
+
+    Um limite do provedor reduz a taxa pela metade (até min_rate). Como as requisições em andamento recebem o mesmo limite 
+    quase ao mesmo tempo, a taxa é reduzida no máximo uma vez a cada "hold" segundos. Depois de "threshold" reduções seguidas, 
+    sem nenhum sucesso entre elas, o disjuntor abre: nenhuma requisição é liberada durante "cooldown" segundos (ou o 
+    Retry-After, se maior). Cada sucesso aumenta a taxa em 1% da taxa máxima, até max_rate.
+    """
+    def __init__(self, max_rate, min_rate=0.5, threshold=5, cooldown=30.0, hold=1.0):
+        """Construtor da classe circuitBreaker.
+
+        Args:
+            max_rate (float): Taxa máxima de requisições por segundo (--rate).
+            min_rate (float): Taxa mínima, em requisições por segundo.
+            threshold (int): Quantidade de reduções seguidas da taxa que abre o disjuntor.
+            cooldown (float): Segundos em que o disjuntor fica aberto.
+            hold (float): Intervalo mínimo, em segundos, entre duas reduções da taxa.
+        """
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.hold = hold
+        self.bucket = tokenBucket(max_rate)
+        self.consecutive = 0 # reduções da taxa seguidas, sem sucesso entre elas
+        self.last_cut = float('-inf') # momento da última redução da taxa
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Espera a vez da próxima requisição (threads)."""
+        self.bucket.wait()
+
+    async def acquire(self):
+        """Espera a vez da próxima requisição (corrotinas)."""
+        await self.bucket.acquire()
+
+    def success(self):
+        """Registra uma resposta do provedor sem limite, aumentando a taxa aos poucos."""
+        if self.consecutive or self.bucket.rate < self.max_rate:
+            with self.lock:
+                self.consecutive = 0
+                self.bucket.set_rate(min(self.max_rate, self.bucket.rate + 0.01*self.max_rate))
+
+    def throttled(self, error=None):
+        """Registra um limite do provedor: reduz a taxa e, se os limites se repetem, pausa as requisições."""
+        metrics.count('throttled')
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_cut < self.hold: # mesmo episódio de limite: a taxa já foi reduzida
+                return
+            self.last_cut = now
+            self.consecutive += 1
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate/2))
+            if self.consecutive >= self.threshold:
+                self.bucket.pause(max(self.cooldown, getattr(error, 'retry_after', None) or 0))
+                self.consecutive = 0
+                metrics.count('breaker_opened')
+
+    def call(self, reverse_function, coord):
+        """Faz uma tentativa de requisição: espera a vez, chama o reverse e informa o resultado ao disjuntor."""
+        self.wait()
+        try:
+            location = timed_reverse(reverse_function, coord)
+        except THROTTLE_ERRORS as error:
+            self.throttled(error)
+            raise
+        self.success()
+        return location
+
+
+class retryQueue:
+    """Coordenadas que falharam, esperando o backoff para uma nova tentativa, compartilhadas entre as threads produtoras."""
+    def __init__(self):
+        """Construtor da classe retryQueue."""
+        self.heap = [] # (momento da nova tentativa, sequência, item, tentativa)
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, item, attempt, delay):
+        """Agenda uma nova tentativa (attempt, começando em 0) do item daqui a "delay" segundos."""
+        with self.lock:
+            self.sequence += 1
+            heapq.heappush(self.heap, (time.monotonic() + delay, self.sequence, item, attempt))
+
+    def pop_due(self):
+        """Retira o próximo item cuja espera terminou, como uma tupla (item, tentativa), ou None."""
+        with self.lock:
+            if self.heap and self.heap[0][0] <= time.monotonic():
+                entry = heapq.heappop(self.heap)
+                return entry[2], entry[3]
+        return None
+
+    def next_due(self):
+        """Segundos até a espera do próximo item terminar, ou None se não houver itens."""
+        with self.lock:
+            return max(0.0, self.heap[0][0] - time.monotonic()) if self.heap else None
+
+
+def request_address(coord, limiter=None):
+    """Uma tentativa de geocodificação reversa de uma coordenada, passando pelo disjuntor quando existir."""
+    if limiter is None:
+        return timed_reverse(reverse, coord)
+    return limiter.call(reverse, coord)
+
+
+def request_with_retries(coord, limiter=None, policy=None):
+    """Geocodificação reversa com novas tentativas na própria thread, esperando o backoff entre elas.
+
+    Returns:
+        O retorno da função reverse. A exceção da última tentativa é levantada quando a coordenada deve ser descartada.
     """
-    c.execute('INSERT INTO addresses (latitude, longitude, rua, numero, bairro, cidade, cep, estado, pais)                 VALUES (?,?,?,?,?,?,?,?,?)', addr)
-    connection.commit()
+    attempt = 0
+    while True:
+        try:
+            return request_address(coord, limiter)
+        except Exception as error:
+            if policy is None or not policy.retryable(error, attempt):
+                raise
+            metrics.count('retries')
+            time.sleep(policy.delay(attempt, error))
+            attempt += 1
+
+
+def give_up(item, error, groups=None):
+    """Descarta uma coordenada (e os membros do seu grupo) que não pôde ser geocodificada.
+
+    A falha segue pela fila de endereços até a consumidora, que conclui a posição do par (a posição do arquivo continua 
+    avançando) e o guarda na tabela failures, refeita por uma retomada (--resume). Nenhuma linha é impressa por falha: a 
+    contagem aparece no resumo das métricas e o erro de cada par fica na tabela failures.
+    """
+    members = groups.discard(item) if groups is not None else []
+    metrics.count('failed', 1 + len(members))
+    for source, index, coord in [item] + members:
+        put_addr(None, coord, source, index, str(error))
 
 
 # ### Threads
@@ -191,72 +1676,167 @@ def dataentry(addr, c, connection):
 #    Qualquer processo de escrita é naturalmente mais lento que um mesmo processo de leitura. Porém, mesmo criando muitas threads consumidoras (escrita no banco), 
 #	 não teríamos um aumento significativo de velocidade considerando a versão free das APIs testadas. Isto é: mesmo criando apenas uma thread consumidora e 
 #	 diversas threads produtoras sem estourar o limite imposto pela API para as requisições, a nossa thread consumidora dá conta de escrever no banco num tempo razoável, 
-#	 ficando bastante tempo ociosa. Por este motivo, a quantidade de threads consumidoras será sempre **uma**, enquanto as threads produtoras podem ser em qualquer quantidade, 
-# 	 parametrizável na função main, a depender das limitações das APIs anteriormente mencionadas.
+#	 ficando bastante tempo ociosa. Por este motivo, a quantidade padrão de threads consumidoras é **uma**, enquanto as threads produtoras podem ser em qualquer quantidade, 
+# 	 parametrizável na função main, a depender das limitações das APIs anteriormente mencionadas. Com o cache ou o provedor offline, a escrita passa a ser o gargalo;
+#    nesses casos, mais threads consumidoras podem ser usadas (--consumers), cada uma escrevendo em um banco de partição (ver "Escrita em partições").
+
+class readerThread(threading.Thread):
+    """Thread leitora, que alimenta a fila de coordenadas.
+
+    Classe da Thread leitora, atributos e parâmetros descritos no método _init_.
+    """
+    def __init__(self, my_id, sources, amount_producers, progress=None, groups=None, fast=False, pool=None, window=1):
+        """Construtor da classe readerThread.
+
+        Note:
+            Os atributos possuem o mesmo nome dos argumentos. Os que não possuirem estão comentados em linha
+
+        Args:
+            my_id (int): ID da thread.
+            sources (list): Arquivos de entrada, repassados para a função read_sources.
+            amount_producers (int): Quantidade de consumidores da fila de coordenadas, que recebem um marcador de fim cada.
+            progress (jobProgress): Progresso de uma execução anterior. Os pares já processados não são colocados na fila.
+            groups (coordinateGroups): Agrupamento dos pares. Apenas os representantes de cada grupo são colocados na fila.
+            fast (bool): Utiliza a leitura vetorizada com NumPy (--fast-parse).
+            pool (ProcessPoolExecutor): Lê os arquivos em blocos, em paralelo, nos processos do pool (--mode processes).
+            window (int): Quantidade máxima de blocos pendentes no pool.
+        """
+        self.my_id = my_id
+        self.sources = sources
+        self.amount_producers = amount_producers
+        self.progress = progress
+        self.groups = groups
+        self.fast = fast
+        self.pool = pool
+        self.window = window
+        self.count = 0 # quantidade de pares de coordenadas lidos
+        self.skipped = 0 # pares ignorados por já terem sido processados (--resume)
+        self.error = None # erro que interrompeu a leitura, verificado pela função main
+        threading.Thread.__init__(self)
+    def run(self):
+        """Coloca cada par de coordenadas na fila q_coord e, ao final, um marcador de fim (None) para cada produtor.
+
+        Os itens da fila são tuplas (arquivo, posição, par de coordenadas). Como a fila é limitada, o put bloqueia enquanto 
+        as produtoras estão atrasadas, mantendo a memória constante. O tempo de leitura (parse) é acumulado localmente e 
+        registrado nas métricas a cada bloco de pares. Um erro de leitura (Ex: arquivo removido durante a execução) é 
+        guardado em self.error; os pares já colocados na fila são processados e a função main termina com falha.
+        """
+        parsed = 0 # pares lidos e ainda não registrados nas métricas
+        parse_time = 0.0
+        try:
+            items = read_sources(self.sources, self.fast, self.pool, self.window)
+            while True:
+                start = time.perf_counter()
+                item = next(items, None)
+                parse_time += time.perf_counter() - start
+                if item is None:
+                    break
+                self.count += 1
+                parsed += 1
+                if parsed == 1000:
+                    metrics.observe('parse', parse_time, parsed)
+                    metrics.count('coords_read', parsed)
+                    parsed, parse_time = 0, 0.0
+                if self.progress is not None and self.progress.processed(item[0], item[1]):
+                    self.skipped += 1
+                    continue
+                if self.groups is not None and not self.groups.claim(item):
+                    continue
+                put_waiting(q_coord, item)
+        except Exception as error:
+            self.error = error
+            print('Erro na leitura dos arquivos de entrada:', error)
+        finally:
+            metrics.observe('parse', parse_time, parsed)
+            metrics.count('coords_read', parsed)
+            for _ in range(self.amount_producers):
+                q_coord.put(None)
 
-def callProducers(amount_producers, lat_lon): 
+
+def callProducers(amount_producers, cache=None, groups=None, limiter=None, policy=None, nearby=None): 
     """Cria as threads produtoras.
 
-    Primeiramente, é feita a divisão da quantidade de requisições de cada thread produtora.
-    Exemplo: se teremos 5 threads produtoras e 1000 pares de coordenadas, cada thread ficará com duzentas requisições.
-    1000(tamanho de lat_lon)/5(quantidade de threads produtoras) = 200 requisições cada thread. Caso esta divisão não
-    seja inteira, a última thread a ser criada ficará responsável por algumas poucas requisições a mais("queries_surp").
-    "init_index" é o índice inicial da lista lat_lon onde cada thread começará a execução. 
-    "my_range" representa a quantidade de requisições que cada thread irá fazer, representando o índice final
-    das requisições para cada thread.
+    Todas as threads produtoras retiram as coordenadas de uma mesma fila ("q_coord"), alimentada pela thread leitora 
+    (readerThread) enquanto os arquivos ainda estão sendo lidos. Assim, nenhuma thread fica ociosa enquanto houver 
+    coordenadas a serem buscadas e as requisições começam já na primeira linha lida.
 
     Args:
         amount_producers (int): Quantidade de threads produtoras definidas na função main de forma parametrizada 
         (Podendo ser qualquer número não ferindo os termos de serviço da API).
-        lat_lon (list): Lista contendo as tuplas de latitude e longitude.
+        cache (addressCache): Cache de endereços consultado antes de cada requisição. None desabilita o cache.
+        groups (coordinateGroups): Agrupamento dos pares, que replica o endereço para os membros de cada grupo.
+        limiter (circuitBreaker): Disjuntor e limite global de requisições, compartilhado entre as threads.
+        policy (retryPolicy): Tentativas e backoff das coordenadas que falharam.
+        nearby (function): Busca de um endereço já gravado perto da coordenada, antes da requisição. None desabilita.
     
     Returns:
         producers (list): Lista de threads produtoras
     """
     producers = []
-    
-    queries = int(len(lat_lon)/amount_producers)
-    queries_surp = len(lat_lon) - (queries*amount_producers)
-
-    init_index = 0
-    my_range = queries 
+    retries = retryQueue() # novas tentativas, atendidas por qualquer thread produtora
     
     for p in range(amount_producers):
-        if p == amount_producers-1:
-            my_range = my_range+queries_surp
-        producer = producerThread(p, init_index, my_range, lat_lon)
+        producer = producerThread(p, cache, groups, limiter, policy, retries, nearby)
         producer.start()
         producers.append(producer)
         print('Thread ID: ', p)
-        print('init_index: ', init_index)
-        print('my_range: ', my_range)
         print('=========================')
-        my_range += queries
-        init_index += queries  
     return producers
 
-def callConsumers(amount_consumers, c, connection): 
+def put_addr(addr, coord, source=None, index=None, error=None):
+    """Coloca um endereço na fila da thread consumidora responsável pela partição da sua coordenada de entrada.
+
+    Args:
+        addr (addressRecord): O endereço já formatado, retornado pela função getAddr(). None indica uma falha (give_up).
+        coord (tuple): Par (lat, lon) de entrada que originou o endereço.
+        source (str): Arquivo de origem do par.
+        index (int): Posição do par no arquivo de origem.
+        error (str): Motivo da falha, quando addr é None.
+    """
+    put_waiting(q_addrs[shard_of(coord, len(q_addrs))], (addr, coord, source, index, error))
+
+
+def put_waiting(fila, item):
+    """Coloca um item em uma fila limitada. Se a fila estiver cheia, o tempo de espera é registrado nas métricas (queue_wait)."""
+    try:
+        fila.put_nowait(item)
+    except queue.Full:
+        start = time.perf_counter()
+        fila.put(item)
+        metrics.observe('queue_wait', time.perf_counter() - start)
+
+
+def get_waiting(fila):
+    """Retira um item de uma fila. Se a fila estiver vazia, o tempo de espera é registrado nas métricas (queue_wait)."""
+    try:
+        return fila.get_nowait()
+    except queue.Empty:
+        start = time.perf_counter()
+        item = fila.get()
+        metrics.observe('queue_wait', time.perf_counter() - start)
+        return item
+
+
+def callConsumers(amount_consumers, writers): 
     """Cria as threads consumidoras.
 
-    Esta função cria a thread consumidora. Para este desafio, apenas uma thread consumidora é criada, pois já é sufi
-    ciente para realizar a tarefa em um tempo razoável nas versões de APIs não pagas, onde não podemos fazer muitas 
-    requisições por segundo. 
+    Esta função cria as threads consumidoras, uma para cada escritor e cada fila de endereços (q_addrs). Com uma única 
+    thread consumidora, a escrita é feita diretamente no banco principal; com mais de uma, cada thread escreve em um banco 
+    de partição próprio (ver merge_shards).
 
     Args:
-        amount_consumers (int): Quantidade de threads consumidoras definidas na função main de forma parametrizada 
-        (neste caso = 1).
-        c (objeto: cursor()): O cursor do BD criado na função main, pois passaremos por parâmetro ao criar a thread, 
-        que vai realizar a escrita.
-        connection (connect()): a conexão criada com o banco na função main()
+        amount_consumers (int): Quantidade de threads consumidoras definidas na função main de forma parametrizada.
+        writers (list): Escritores em lote (batchWriter) criados na função main, um para cada thread consumidora.
     
     Returns:
         consumers (list): Lista de threads consumidoras
     """
     consumers = []
     
-    consumer = consumerThread(amount_consumers, c, connection) 
-    consumer.start()
-    consumers.append(consumer)
+    for c in range(amount_consumers):
+        consumer = consumerThread(c, writers[c], q_addrs[c]) 
+        consumer.start()
+        consumers.append(consumer)
     return consumers
 
 class producerThread(threading.Thread): 
@@ -264,43 +1844,112 @@ class producerThread(threading.Thread):
 
     Classe da Thread produtora, atributos e parâmetros descritos no método _init_.
     """
-    def __init__(self, my_id, index, my_range, lat_lon):
+    def __init__(self, my_id, cache=None, groups=None, limiter=None, policy=None, retries=None, nearby=None):
         """Construtor da classe producerThread.
 
         Este método é o construtor da classe.
         
         Note:
-            Os atributos possuem o mesmo nome dos argumentos.
+            Os atributos possuem o mesmo nome dos argumentos. Os que não possuirem estão comentados em linha
             
         Args:
             my_id (int): ID da thread.
-            index (int): Índice inicial do range de busca da lista lat_lon. Específico para cada thread.
-            my_range (int): Range de busca de cada thread, representando o índice final. Específico para cada thread.
-            lat_lon (list): Lista contendo todos pares de coordenadas a serem utilizados nas requisições
+            cache (addressCache): Cache de endereços compartilhado entre as threads produtoras. None desabilita o cache.
+            groups (coordinateGroups): Agrupamento dos pares, que replica o endereço para os membros de cada grupo.
+            limiter (circuitBreaker): Disjuntor e limite global de requisições. None não limita (provedor offline).
+            policy (retryPolicy): Tentativas e backoff das coordenadas que falharam. None descarta na primeira falha.
+            retries (retryQueue): Fila de novas tentativas compartilhada entre as threads produtoras.
+            nearby (function): Busca um endereço já gravado perto da coordenada (addressIndex.nearby), antes do cache e 
+            da requisição. None desabilita.
         """
         self.my_id = my_id
-        self.index = index
-        self.my_range = my_range
-        self.lat_lon = lat_lon
+        self.cache = cache
+        self.groups = groups
+        self.limiter = limiter
+        self.policy = policy
+        self.retries = retries
+        self.nearby = nearby
+        self.count = 0 # quantidade de coordenadas processadas pela thread
         threading.Thread.__init__(self)
+    def deliver(self, item, addr):
+        """Entrega o endereço de um item para a fila de endereços (com os membros do seu grupo, se houver)."""
+        if self.groups is not None:
+            self.groups.resolve(item, addr) # o endereço segue para a fila junto com os membros do grupo
+        else:
+            put_addr(addr, item[2], item[0], item[1]) 
+        self.count += 1
+    def process(self, item, attempt):
+        """Geocodifica um item da fila de coordenadas e entrega o seu endereço.
+
+        Uma falha da requisição agenda uma nova tentativa (ou descarta o item); as demais exceções são tratadas no método run.
+
+        Args:
+            item (tuple): Tupla (arquivo, posição, par de coordenadas), como colocada na fila q_coord.
+            attempt (int): Quantidade de tentativas já feitas para o item.
+        """
+        source, index, coord = item
+        addr = self.nearby(coord) if self.nearby is not None and attempt == 0 else None
+        if addr is not None: # endereço já gravado a poucos metros: nenhuma requisição
+            metrics.count('reused')
+            self.deliver(item, addr)
+            return
+        location = self.cache.get(coord) if self.cache is not None and attempt == 0 else None
+        if location is not None:
+            metrics.count('cache_hits')
+        else:
+            if self.cache is not None and attempt == 0:
+                metrics.count('cache_misses')
+            try:
+                location = request_address(coord, self.limiter) #geocodificação reversa
+            except Exception as error:
+                if self.policy is not None and self.retries is not None and self.policy.retryable(error, attempt):
+                    metrics.count('retries')
+                    self.retries.schedule(item, attempt + 1, self.policy.delay(attempt, error)) # outra thread pode atender
+                else:
+                    give_up(item, error, self.groups)
+                return
+            if self.cache is not None:
+                self.cache.put(coord, location)
+        start = time.perf_counter()
+        addr = getAddr(location) if location is not None else empty_address(coord)
+        metrics.observe('normalize', time.perf_counter() - start)
+        self.deliver(item, addr)
     def run(self):
         """Método que possui a real execução de cada thread.
 
-        Define o que realmente cada thread irá executar. REALIZAÇÃO DA GEOCODIFICAÇÃO REVERSA. "location" recebe o objeto 
+        Define o que realmente cada thread irá executar. REALIZAÇÃO DA GEOCODIFICAÇÃO REVERSA. Cada coordenada é retirada 
+        da fila de coordenadas (q_coord) até que o marcador de fim (None) seja encontrado. "location" recebe o objeto 
         Location contendo o endereço correspondente às coordenadas. Em seguida, a função getAddr vista anteriormente trata 
-        o objeto location e retorna a lista contendo exatamente as informações a serem inseridas no banco de dados. 
-        Por fim, a lista (addr) com as informações é adicionada em uma fila de endereços (q_addr - address queue)
-        """
-        for i in range(self.index, self.my_range): # range de busca específico para cada thread
-            #geocodificação reversa
-            location = reverse(self.lat_lon[i], exactly_one=True) # exactly_one=True retorna um formato com infos detalhadas
-            addr = getAddr(location)
-            q_addr.put(addr) 
-            print('self.my_id: ', self.my_id)
-            print('self.index: ', self.index)
-            print('self.my_range: ', self.my_range)
-            print('index atual: ', i)
-            print('------------------------------')
+        o objeto location e retorna o registro contendo exatamente as informações a serem inseridas no banco de dados. 
+        Por fim, o registro (addr) com as informações é adicionada em uma fila de endereços (q_addrs - address queues).
+        Caso exista um cache, ele é consultado antes da requisição e atualizado após uma requisição feita à API.
+        Uma coordenada cuja requisição falhou volta para a fila de novas tentativas (retryQueue), que tem prioridade sobre 
+        a fila de coordenadas quando a sua espera termina. Ao encontrar o marcador de fim com novas tentativas pendentes, a 
+        thread devolve o marcador para a fila e espera por elas. Uma exceção fora da requisição (cache, índice espacial ou 
+        getAddr) descarta apenas o item (give_up), e a thread segue com os próximos.
+        O tempo de cada etapa e os contadores são registrados nas métricas (ver runtimeMetrics).
+        """
+        while True:
+            entry = self.retries.pop_due() if self.retries is not None else None
+            if entry is not None:
+                item, attempt = entry
+            else:
+                timeout = self.retries.next_due() if self.retries is not None else None
+                try:
+                    item = get_waiting(q_coord) if timeout is None else q_coord.get(timeout=timeout)
+                except queue.Empty: # a espera de uma nova tentativa terminou
+                    continue
+                if item is None: # fim dos arquivos
+                    if self.retries is not None and len(self.retries):
+                        q_coord.put(None) # o marcador fica para quando não houver mais novas tentativas
+                        time.sleep(self.retries.next_due() or 0)
+                        continue
+                    break
+                attempt = 0
+            try:
+                self.process(item, attempt)
+            except Exception as error: # falha fora da requisição (cache, índice, getAddr): descarta o item, não a thread
+                give_up(item, error, self.groups)
 #             time.sleep(1)
 
 class consumerThread(threading.Thread):
@@ -308,7 +1957,7 @@ class consumerThread(threading.Thread):
 
     Classe da Thread consumidora, atributos e parâmetros descritos no método _init_.
     """
-    def __init__(self, my_id, c, connection):
+    def __init__(self, my_id, writer, q_addr):
         """Construtor da classe consumerThread.
 
         Este método é o construtor da classe.
@@ -318,32 +1967,515 @@ class consumerThread(threading.Thread):
             
         Args:
             my_id (int): ID da thread.
-            c (objeto cursor()): Cursor para o banco de dados.
-            connection (connect()): a conexão criada com o banco na função main()
+            writer (batchWriter): Escritor em lote dos endereços no banco de dados.
+            q_addr (queue.Queue): Fila de endereços desta thread consumidora.
         """
         self.my_id = my_id
-        self.c = c
-        self.connection = connection
-        self._running = True # Membro privado utilizado para controlar a execução da thread na main
+        self.writer = writer
+        self.q_addr = q_addr
+        self.error = None # erro de escrita que interrompeu a gravação, verificado pela função main
         threading.Thread.__init__(self)
     def terminate(self):
         """Destrutor.
 
-        Funciona como um "destrutor" da thread consumidora, adicionando o valor 'False' para _running
+        Funciona como um "destrutor" da thread consumidora: coloca o marcador de fim (None) na fila. Como a fila é FIFO, 
+        todos os endereços colocados antes do marcador ainda são escritos no banco antes de a thread terminar.
         """
-        self._running = False
+        self.q_addr.put(None)
     def run(self):
         """Método que possui a real execução de cada thread.
 
-        Define o que realmente cada thread irá executar. Enquanto _running for 'True' e ainda existir elementos na fila,
-        um endereço é retirado da fila e a função 'dataentry' é chamada para adicionar o endereço no banco de dados.
+        Define o que realmente cada thread irá executar. Um endereço é retirado da fila e adicionado ao lote do escritor 
+        (batchWriter), que o insere no banco de dados, até que o marcador de fim seja encontrado. A espera na fila é 
+        bloqueante (sem consumir CPU), limitada ao tempo que falta para o lote expirar. Ao finalizar, o restante do lote é 
+        escrito no banco.
+        Se a escrita falhar mesmo após as novas tentativas do batchWriter, o erro é guardado em self.error e a thread 
+        continua esvaziando a fila até o marcador de fim, sem escrever, para que as produtoras não fiquem bloqueadas na 
+        fila cheia. A função main verifica o erro e termina com falha.
         """
-        while self._running:
-            while q_addr.empty() == False:
-                addr = q_addr.get()
-                q_addr.task_done()
-                dataentry(addr, self.c, self.connection)
-                print('Escrevendo no banco......') 
+        finished = False # o marcador de fim já foi retirado da fila
+        try:
+            while True:
+                try:
+                    item = self.q_addr.get(timeout=self.writer.time_to_flush()) # None: espera até chegar um endereço
+                except queue.Empty: # o lote expirou sem novos endereços
+                    self.writer.flush_if_due()
+                    continue
+                self.q_addr.task_done()
+                if item is None: # fim dos endereços
+                    finished = True
+                    break
+                self.writer.add(*item)
+            self.writer.close()
+        except Exception as error: # banco inacessível: os endereços restantes são descartados
+            self.error = error
+            print('Erro na escrita do banco de dados:', error)
+            while not finished:
+                finished = self.q_addr.get() is None
+                self.q_addr.task_done()
+
+
+# ### Modo assíncrono
+#    No modo com threads, cada thread produtora faz uma requisição por vez, retirando as coordenadas da fila q_coord; a vazão depende da
+#    quantidade de threads (--producers) e, com o GoogleV3, o limite global de requisições é aplicado pelo disjuntor (circuitBreaker, ver
+#    "Requisições resilientes"). No modo assíncrono (--mode async), uma única thread executa um loop asyncio em que até "concurrency"
+#    requisições ficam em andamento ao mesmo tempo, retirando as coordenadas de uma fila de trabalho compartilhada, alimentada a partir da
+#    fila q_coord, sem a necessidade de ajustar a quantidade de threads. Nos dois modos, antes de cada requisição é reservada uma ficha do
+#    mesmo balde de fichas (token bucket) global, reabastecido a "rate" fichas por segundo, o que mantém a vazão no limite do provedor sem
+#    estourar o "Too Many Requests".
+
+class tokenBucket:
+    """Limitador de taxa global (token bucket) compartilhado por todas as requisições em andamento.
+
+    Cada chamada reserva uma ficha, mesmo que ainda não exista: o saldo fica negativo e quem reservou espera o tempo 
+    necessário para o balde repor a ficha. Assim a ordem de chegada é respeitada e o mesmo balde pode ser usado pelas 
+    threads produtoras (wait) e pelas corrotinas do modo assíncrono (acquire).
+    """
+    def __init__(self, rate, capacity=1):
+        """Construtor da classe tokenBucket.
+
+        Args:
+            rate (float): Quantidade de fichas repostas por segundo (requisições por segundo).
+            capacity (int): Quantidade máxima de fichas acumuladas, ou seja, o tamanho da rajada permitida.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        """Repõe as fichas do tempo decorrido desde a última reposição. Deve ser chamado com o lock."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last)*self.rate)
+        self.last = now
+
+    def reserve(self):
+        """Reserva uma ficha e retorna quantos segundos é preciso esperar até poder utilizá-la."""
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens/self.rate
+
+    def set_rate(self, rate):
+        """Altera a taxa de reposição, a partir de agora."""
+        with self.lock:
+            self.refill()
+            self.rate = rate
+
+    def pause(self, seconds):
+        """Faz com que a próxima ficha só fique disponível depois de "seconds" segundos."""
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.tokens, 1 - seconds*self.rate)
+
+    def wait(self):
+        """Espera até que exista uma ficha disponível e a retira do balde (threads)."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire(self):
+        """Espera até que exista uma ficha disponível e a retira do balde (corrotinas)."""
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def produce_async(reverse_function, limiter, concurrency, cache=None, groups=None, policy=None, nearby=None):
+    """Executa a geocodificação reversa das coordenadas da fila q_coord com até "concurrency" requisições simultâneas.
+
+    Args:
+        reverse_function (function): Função reverse do provedor. Pode ser assíncrona (GoogleV3 com AioHTTPAdapter) ou
+        síncrona (provedor offline).
+        limiter (circuitBreaker): Disjuntor e limitador de taxa global, consultado antes de cada requisição ao provedor. 
+        None não limita (provedor offline).
+        concurrency (int): Quantidade máxima de requisições em andamento.
+        cache (addressCache): Cache de endereços consultado antes de cada requisição. None desabilita o cache.
+        groups (coordinateGroups): Agrupamento dos pares, que replica o endereço para os membros de cada grupo.
+        policy (retryPolicy): Tentativas e backoff das coordenadas que falharam. A espera do backoff não bloqueia as 
+        outras corrotinas. None descarta a coordenada na primeira falha.
+        nearby (function): Busca de um endereço já gravado perto da coordenada, antes do cache e da requisição. None desabilita.
+    """
+    work = asyncio.Queue(maxsize=concurrency) # fila de trabalho compartilhada: nenhuma corrotina fica ociosa enquanto houver coordenadas
+
+    async def feeder():
+        while True:
+            item = await asyncio.to_thread(q_coord.get) # a fila q_coord é bloqueante, por isso é lida fora do loop
+            if item is None: # fim dos arquivos: um marcador de fim para cada corrotina
+                for _ in range(concurrency):
+                    await work.put(None)
+                return
+            await work.put(item)
+
+    async def request(coord):
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire()
+            start = time.perf_counter()
+            failure = None
+            try:
+                location = reverse_function(coord, exactly_one=True)
+                if inspect.isawaitable(location):
+                    location = await location
+            except Exception as error:
+                failure = error
+            metrics.observe('request', time.perf_counter() - start)
+            metrics.count('requests')
+            if failure is None:
+                if limiter is not None:
+                    limiter.success()
+                return location
+            metrics.count('errors')
+            if limiter is not None and isinstance(failure, THROTTLE_ERRORS):
+                limiter.throttled(failure)
+            if policy is None or not policy.retryable(failure, attempt):
+                raise failure
+            metrics.count('retries')
+            await asyncio.sleep(policy.delay(attempt, failure))
+            attempt += 1
+
+    async def resolve(item):
+        source, index, coord = item
+        addr = nearby(coord) if nearby is not None else None
+        if addr is not None:
+            metrics.count('reused')
+        else:
+            location = cache.get(coord) if cache is not None else None
+            if location is None:
+                if cache is not None:
+                    metrics.count('cache_misses')
+                try:
+                    location = await request(coord)
+                except Exception as error:
+                    give_up(item, error, groups)
+                    return
+                if cache is not None:
+                    cache.put(coord, location)
+            else:
+                metrics.count('cache_hits')
+            start = time.perf_counter()
+            addr = getAddr(location) if location is not None else empty_address(coord)
+            metrics.observe('normalize', time.perf_counter() - start)
+        if groups is not None:
+            groups.resolve(item, addr)
+        else:
+            put_addr(addr, coord, source, index) # fila cheia: o loop espera a escrita (contrapressão)
+
+    async def worker():
+        while True:
+            item = await work.get()
+            if item is None:
+                return
+            try:
+                await resolve(item)
+            except Exception as error: # falha fora da requisição (cache, índice, getAddr): a corrotina continua
+                give_up(item, error, groups)
+
+    await asyncio.gather(feeder(), *(worker() for _ in range(concurrency)))
+
+
+class asyncProducerThread(threading.Thread):
+    """Thread produtora do modo assíncrono, que executa o loop asyncio.
+
+    Classe da Thread produtora assíncrona, atributos e parâmetros descritos no método _init_.
+    """
+    def __init__(self, my_id, limiter, concurrency, provider='google', cache=None, groups=None, policy=None, nearby=None):
+        """Construtor da classe asyncProducerThread.
+
+        Note:
+            Os atributos possuem o mesmo nome dos argumentos.
+
+        Args:
+            my_id (int): ID da thread.
+            limiter (circuitBreaker): Disjuntor e limite global de requisições por segundo. None não limita (provedor offline).
+            concurrency (int): Quantidade máxima de requisições em andamento.
+            provider (str): 'google' cria um GoogleV3 com o adaptador assíncrono; outro valor utiliza a função reverse global.
+            cache (addressCache): Cache de endereços. None desabilita o cache.
+            groups (coordinateGroups): Agrupamento dos pares. None desabilita a deduplicação.
+            policy (retryPolicy): Tentativas e backoff das coordenadas que falharam.
+            nearby (function): Busca de um endereço já gravado perto da coordenada. None desabilita.
+        """
+        self.my_id = my_id
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.provider = provider
+        self.cache = cache
+        self.groups = groups
+        self.policy = policy
+        self.nearby = nearby
+        threading.Thread.__init__(self)
+
+    async def main_async(self):
+        """Cria o geolocator assíncrono e executa a geocodificação de todas as coordenadas."""
+        if self.provider != 'google':
+            await produce_async(reverse, self.limiter, self.concurrency, self.cache, self.groups, self.policy, self.nearby)
+            return
+        from geopy.adapters import AioHTTPAdapter # dependência opcional (aiohttp), utilizada apenas neste modo
+        async with GoogleV3(api_key=geolocator.api_key, domain=geolocator.domain, scheme=geolocator.scheme,
+                            timeout=geolocator.timeout, adapter_factory=AioHTTPAdapter) as async_geolocator:
+            await produce_async(async_geolocator.reverse, self.limiter, self.concurrency, self.cache, self.groups, self.policy,
+                                self.nearby)
+
+    def run(self):
+        """Método que possui a real execução da thread: executa o loop asyncio até o fim das requisições."""
+        asyncio.run(self.main_async())
+
+
+# ### Modo multiprocesso
+#    Com o cache ou o provedor offline, a rede deixa de ser o gargalo e as etapas que consomem CPU (a leitura dos arquivos, a busca do endereço
+#    mais próximo e o tratamento do 'address_components' pela função getAddr) ficam presas ao GIL nas threads. No modo multiprocesso
+#    (--mode processes), essas etapas são distribuídas entre --workers processos de um ProcessPoolExecutor: cada arquivo é dividido em blocos
+#    de bytes lidos em paralelo (parse_range) e as coordenadas são enviadas em lotes (resolve_batch) aos processos, que consultam o próprio
+#    cache, chamam o próprio reverse e devolvem apenas as tuplas compactas de endereço. O payload bruto nunca sai do processo que o obteve.
+#    Uma thread despachante (processProducerThread) substitui as threads produtoras e entrega os endereços às consumidoras, como nos outros modos.
+
+PARSE_CHUNK_SIZE = 4*1024*1024 # bytes de cada bloco de um arquivo lido em paralelo
+
+def file_ranges(archive_name, chunk_size=PARSE_CHUNK_SIZE):
+    """Divide um arquivo em intervalos de bytes [início, fim) de até chunk_size bytes."""
+    size = os.path.getsize(archive_name)
+    return [(archive_name, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+
+def parse_range(archive_name, start, end):
+    """Extrai os pares de coordenadas das linhas que começam no intervalo de bytes [start, end) de um arquivo.
+
+    A regra é a mesma da função read_file. Uma linha que começa antes de "start" pertence ao bloco anterior. Se a última 
+    latitude do bloco ainda não formou par, as linhas seguintes (já do próximo bloco) são lidas até a sua longitude, que o 
+    próximo bloco descarta por começar sem latitude, como a função read_file faria. Executada nos processos do pool.
+
+    Args:
+        archive_name (str): O nome do arquivo texto.
+        start (int): Posição, em bytes, do início do bloco.
+        end (int): Posição, em bytes, do fim do bloco.
+
+    Returns:
+        Lista de tuplas contendo um par de coordenadas, no mesmo formato da função read_file.
+    """
+    pairs = []
+    with open(archive_name, 'rb') as arquivo:
+        if start > 0:
+            arquivo.seek(start - 1)
+            arquivo.readline() # descarta o resto da linha que começou no bloco anterior
+        flag = False
+        while True:
+            if arquivo.tell() >= end and not flag: # fim do bloco, sem latitude pendente
+                break
+            linha = arquivo.readline()
+            if not linha:
+                break
+            geometry = linha.decode().split(' ')
+            if geometry[0].find('Latitude:') != -1:
+                if arquivo.tell() - len(linha) >= end: # a latitude já é do próximo bloco
+                    break
+                lat = geometry[4].strip()
+                flag = True
+            elif geometry[0].find('Longitude:') != -1 and flag == True:
+                pairs.append((lat, geometry[4].strip()))
+                flag = False
+    return pairs
+
+
+def ordered_map(pool, function, arguments, window, on_error=None):
+    """Executa function no pool para cada tupla de argumentos, entregando os resultados na ordem de envio.
+
+    Ao contrário do pool.map, no máximo "window" tarefas ficam pendentes ao mesmo tempo, assim os argumentos são consumidos 
+    sob demanda e os resultados não se acumulam na memória quando as etapas seguintes estão atrasadas.
+
+    Args:
+        on_error (function): Chamada com a tupla de argumentos e a exceção de uma tarefa que falhou (inclusive com o pool 
+        quebrado); o seu retorno substitui o resultado da tarefa. None propaga a exceção.
+
+    Yields:
+        O resultado de cada tarefa, na ordem dos argumentos.
+    """
+    pending = collections.deque()
+
+    def submit(argument):
+        try:
+            future = pool.submit(function, *argument)
+        except Exception as error: # pool quebrado ou encerrado: a falha é entregue na ordem, como a das outras tarefas
+            future = concurrent.futures.Future()
+            future.set_exception(error)
+        pending.append((argument, future))
+
+    def result():
+        argument, future = pending.popleft()
+        try:
+            return future.result()
+        except Exception as error:
+            if on_error is None:
+                raise
+            return on_error(argument, error)
+
+    for argument in arguments:
+        submit(argument)
+        if len(pending) >= window:
+            yield result()
+    while pending:
+        yield result()
+
+
+worker_cache = None # cache de endereços do processo do pool (ver init_worker)
+worker_limiter = None # disjuntor do processo do pool
+worker_policy = None # tentativas e backoff do processo do pool
+worker_nearby = None # busca de endereços já gravados, do processo do pool
+
+def init_worker(provider='google', reference=None, cell_size=None, cache_options=None, limiter_options=None, policy_options=None,
+                timeout=None, reuse_options=None):
+    """Prepara um processo do pool: provedor de geocodificação reversa, cache de endereços e disjuntor próprios.
+
+    Args:
+        provider (str): 'offline' carrega a base de referência no processo; 'google' utiliza o geolocator do módulo.
+        reference (str): Base de referência do provedor offline.
+        cell_size (float): Tamanho da célula da grade espacial do provedor offline.
+        cache_options (tuple): Argumentos do addressCache do processo. None desabilita o cache.
+        limiter_options (tuple): Argumentos do circuitBreaker do processo, com a parcela da taxa global que cabe a ele.
+        None não limita as requisições.
+        policy_options (tuple): Argumentos do retryPolicy. None descarta as coordenadas na primeira falha.
+        timeout (float): Timeout das requisições ao GoogleV3, em segundos.
+        reuse_options (tuple): Banco de dados e distância, em metros, da busca de endereços já gravados (--reuse-meters). 
+        None desabilita.
+    """
+    global reverse, worker_cache, worker_limiter, worker_policy, worker_nearby
+    if provider == 'offline':
+        reverse = offlineGeocoder(reference, cell_size).reverse
+    elif timeout is not None:
+        geolocator.timeout = timeout
+    if cache_options is not None:
+        worker_cache = addressCache(*cache_options) # cada processo tem a sua conexão; o SQLite controla o acesso ao arquivo
+    if limiter_options is not None:
+        worker_limiter = circuitBreaker(*limiter_options)
+    if policy_options is not None:
+        worker_policy = retryPolicy(*policy_options)
+    if reuse_options is not None:
+        database, meters = reuse_options
+        index = addressIndex(sqlite3.connect(database, check_same_thread=False))
+        worker_nearby = lambda coord: index.nearby(coord, meters)
+
+
+def resolve_batch(batch):
+    """Geocodifica um lote de itens da fila de coordenadas em um processo do pool.
+
+    Args:
+        batch (list): Tuplas (arquivo, posição, par de coordenadas), como colocadas na fila q_coord.
+
+    Returns:
+        Uma tupla (resultados, falhas, métricas): "resultados" é uma lista de tuplas (item, endereço), com o endereço já 
+        formatado pela função getAddr, "falhas" é uma lista de tuplas (item, erro) das coordenadas descartadas após as 
+        novas tentativas (feitas no próprio processo) e "métricas" é o snapshot das medidas deste lote, somado às métricas 
+        globais pela despachante.
+    """
+    global metrics
+    metrics = runtimeMetrics() # medidas apenas deste lote
+    results = []
+    failures = []
+    for item in batch:
+        try: # qualquer falha (requisição, cache, índice ou getAddr) descarta apenas o item
+            results.append((item, resolve_item(item[2])))
+        except Exception as error:
+            failures.append((item, str(error)))
+    if worker_cache is not None:
+        worker_cache.flush() # o processo não fecha o cache: os acessos são gravados ao fim de cada lote
+    return results, failures, metrics.snapshot()
+
+
+def resolve_item(coord):
+    """Endereço de uma coordenada em um processo do pool: endereço já gravado perto dela, cache ou requisição com novas tentativas."""
+    addr = worker_nearby(coord) if worker_nearby is not None else None
+    if addr is not None: # endereço já gravado a poucos metros
+        metrics.count('reused')
+        return addr
+    location = worker_cache.get(coord) if worker_cache is not None else None
+    if location is None:
+        if worker_cache is not None:
+            metrics.count('cache_misses')
+        location = request_with_retries(coord, worker_limiter, worker_policy)
+        if worker_cache is not None:
+            worker_cache.put(coord, location)
+    else:
+        metrics.count('cache_hits')
+    start = time.perf_counter()
+    addr = getAddr(location) if location is not None else empty_address(coord)
+    metrics.observe('normalize', time.perf_counter() - start)
+    return addr
+
+
+class processProducerThread(threading.Thread):
+    """Thread despachante do modo multiprocesso, que envia as coordenadas em lotes ao pool de processos.
+
+    Classe da Thread despachante, atributos e parâmetros descritos no método _init_.
+    """
+    def __init__(self, my_id, pool, window, batch_size=1000, groups=None):
+        """Construtor da classe processProducerThread.
+
+        Note:
+            Os atributos possuem o mesmo nome dos argumentos. Os que não possuirem estão comentados em linha
+
+        Args:
+            my_id (int): ID da thread.
+            pool (ProcessPoolExecutor): Pool de processos, preparado pela função init_worker.
+            window (int): Quantidade máxima de lotes pendentes no pool.
+            batch_size (int): Quantidade de coordenadas de cada lote.
+            groups (coordinateGroups): Agrupamento dos pares, que replica o endereço para os membros de cada grupo.
+        """
+        self.my_id = my_id
+        self.pool = pool
+        self.window = window
+        self.batch_size = batch_size
+        self.groups = groups
+        self.count = 0 # quantidade de coordenadas processadas
+        threading.Thread.__init__(self)
+
+    def batches(self):
+        """Agrupa os itens da fila q_coord em lotes, até o marcador de fim. Um lote incompleto é enviado se a fila ficar vazia.
+
+        O tamanho de cada lote é limitado pelos itens já na fila divididos pela janela de lotes pendentes: com uma entrada 
+        pequena (ou uma leitura lenta), os itens são repartidos entre todos os processos em vez de formar um único lote.
+        """
+        batch = []
+        limit = self.batch_size
+        while True:
+            try:
+                item = q_coord.get(timeout=0.1) if batch else q_coord.get()
+            except queue.Empty: # a leitura está atrasada: o lote incompleto segue para o pool
+                yield (batch,)
+                batch = []
+                continue
+            if item is None: # fim dos arquivos
+                break
+            if not batch:
+                limit = min(self.batch_size, max(1, (q_coord.qsize() + 1)//self.window))
+            batch.append(item)
+            if len(batch) >= limit:
+                yield (batch,)
+                batch = []
+        if batch:
+            yield (batch,)
+
+    def failed_batch(self, argument, error):
+        """Resultado de um lote cujo processamento falhou por inteiro (processo encerrado, pool quebrado): todos os itens falham."""
+        return [], [(item, str(error)) for item in argument[0]], None
+
+    def run(self):
+        """Método que possui a real execução da thread: entrega às consumidoras os endereços devolvidos pelos processos.
+
+        A falha de um lote inteiro descarta apenas os seus itens (give_up); a thread continua esvaziando a fila q_coord, para 
+        que a thread leitora nunca fique bloqueada.
+        """
+        for results, failures, snapshot in ordered_map(self.pool, resolve_batch, self.batches(), self.window, self.failed_batch):
+            if snapshot is not None:
+                metrics.merge(snapshot)
+            for item, error in failures:
+                give_up(item, error, self.groups)
+            for item, addr in results:
+                if self.groups is not None:
+                    self.groups.resolve(item, addr)
+                else:
+                    put_addr(addr, item[2], item[0], item[1])
+            self.count += len(results)
 
 
 # ### Função principal
@@ -351,68 +2483,271 @@ class consumerThread(threading.Thread):
 #    O GoogleV3 versão free permite até 50 requisiçoes por segundo, porém a chave de API (do candidato que vos fala) contida neste desafio é 
 #    limitada também quanto ao número de requisições por mês e não suportará muitas execuções. É possível modificar a quantidade de threads produtoras
 #	 a ser utilizada (em "amount_producers = ?), lembrando que não pode ultrapassar 50 req/s. Outra imporante exceção, diz respeito a quantidade de threads consumidoras. 
-#    A aplicação só funcionará para UMA thread consumidora. Portanto, a quantidade de threads consumidoras deve ser 1. Isso porque mais threads consumidoras 
+#    Com a API, UMA thread consumidora é suficiente. Isso porque mais threads consumidoras 
 #    não aumentariam significativamente a velocidade da aplicação considerando a versão não paga, já que não podemos realizar muitas requisições ao mesmo tempo 
-#    e o maior gargalo é na busca do endereço. Deste modo, acabei não desenvolvendo para mais de uma thread consumidora. Detalhes da função main por _docstrings_
+#    e o maior gargalo é na busca do endereço. Com o cache ou o provedor offline, mais threads consumidoras (--consumers) escrevem em partições. Detalhes da função main por _docstrings_
+
+
+# Arquivos lidos quando nenhuma entrada é informada. 'data_points_teste.txt' foi criado para testes, com menos coordenadas
+DEFAULT_INPUTS = ['data_points_20180101.txt', 'data_points_20180102.txt', 'data_points_20180103.txt']
+
+def parse_args(argv=None):
+    """Lê os parâmetros de execução da linha de comando.
+
+    Args:
+        argv (list): Lista de argumentos. None utiliza os argumentos do processo (sys.argv).
+
+    Returns:
+        Um objeto argparse.Namespace com os parâmetros da execução.
+    """
+    parser = argparse.ArgumentParser(description='Geocodificação reversa de coordenadas geográficas para um banco SQLite.')
+    parser.add_argument('inputs', nargs='*', default=DEFAULT_INPUTS,
+                        help="arquivos texto de entrada, padrões glob (Ex: 'data_points_*.txt') ou '-' para a entrada padrão")
+    parser.add_argument('--fast-parse', action='store_true',
+                        help='lê os arquivos com mmap e NumPy, de forma vetorizada (exige o NumPy)')
+    parser.add_argument('--queue-size', type=int, default=10000,
+                        help='tamanho máximo das filas de coordenadas e de endereços entre as etapas (padrão: 10000)')
+    parser.add_argument('--provider', choices=['google', 'offline'], default='google',
+                        help='provedor da geocodificação reversa: API GoogleV3 ou base local (padrão: google)')
+    parser.add_argument('--reference', help='base de referência (CSV ou GeoJSON) do provedor offline')
+    parser.add_argument('--offline-cell', type=float,
+                        help='tamanho da célula da grade espacial do provedor offline, em graus (padrão: calculado pela densidade)')
+    parser.add_argument('--producers', type=int, default=10,
+                        help='modo threads: quantidade de threads produtoras (padrão: 10, aconselhável manter < 50 req/s)')
+    parser.add_argument('--mode', choices=['threads', 'async', 'processes'], default='threads',
+                        help='modo de execução das requisições: threads produtoras, asyncio ou pool de processos (padrão: threads)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='modo processes: quantidade de processos da leitura e da geocodificação (padrão: quantidade de CPUs)')
+    parser.add_argument('--rate', type=float, default=50,
+                        help='limite global de requisições por segundo ao GoogleV3, reduzido pelo disjuntor quando o provedor '
+                             'limita as requisições. O provedor offline não é limitado (padrão: 50)')
+    parser.add_argument('--request-timeout', type=float, default=10,
+                        help='timeout de cada requisição ao GoogleV3, em segundos (padrão: 10)')
+    parser.add_argument('--retries', type=int, default=5,
+                        help='quantidade máxima de tentativas de cada coordenada, incluindo a primeira (padrão: 5)')
+    parser.add_argument('--backoff-base', type=float, default=0.5,
+                        help='espera máxima antes da segunda tentativa, em segundos, dobrada a cada falha (padrão: 0.5)')
+    parser.add_argument('--backoff-max', type=float, default=30,
+                        help='limite da espera entre as tentativas, em segundos (padrão: 30)')
+    parser.add_argument('--breaker-threshold', type=int, default=5,
+                        help='limites do provedor seguidos que pausam todas as requisições (padrão: 5)')
+    parser.add_argument('--breaker-cooldown', type=float, default=30,
+                        help='segundos de pausa das requisições quando o disjuntor abre (padrão: 30)')
+    parser.add_argument('--concurrency', type=int, default=20,
+                        help='modo async: quantidade máxima de requisições em andamento (padrão: 20)')
+    parser.add_argument('--resume', action='store_true',
+                        help='retoma uma execução interrompida, ignorando os pares de coordenadas já gravados no banco')
+    parser.add_argument('--key-precision', type=int, default=6,
+                        help='casas decimais da coordenada de entrada usada como chave única da tabela addresses (padrão: 6)')
+    parser.add_argument('--snap-meters', type=float, default=0,
+                        help='agrupa os pares de coordenadas em células com este lado, em metros, e geocodifica um par por '
+                             'célula. 0 agrupa apenas pares iguais (padrão: 0)')
+    parser.add_argument('--reuse-meters', type=float, default=0,
+                        help='reutiliza o endereço já gravado no banco a até esta distância, em metros, sem nova requisição. '
+                             '0 desabilita (padrão: 0)')
+    parser.add_argument('--spatial-index', action='store_true',
+                        help='cria o índice espacial (R-tree) ao final da carga, para as consultas de addressIndex. Com '
+                             '--reuse-meters, o índice é criado no início e mantido durante a carga')
+    parser.add_argument('--database', default='challenge_db.db', help='banco de dados SQLite de saída (padrão: challenge_db.db)')
+    parser.add_argument('--consumers', type=int, default=1,
+                        help='quantidade de threads consumidoras. Com mais de uma, cada uma escreve em um banco de partição, '
+                             'copiado para o banco principal ao final (padrão: 1)')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='quantidade de endereços escritos no banco em cada transação (padrão: 1000)')
+    parser.add_argument('--flush-interval', type=float, default=1.0,
+                        help='tempo máximo, em segundos, que um endereço espera no lote antes de ser escrito (padrão: 1.0)')
+    parser.add_argument('--wal', action='store_true', help='utiliza o journal mode WAL no banco de dados')
+    parser.add_argument('--synchronous', choices=['OFF', 'NORMAL', 'FULL', 'EXTRA'],
+                        help='valor do pragma synchronous do banco de dados (padrão: o do SQLite)')
+    parser.add_argument('--db-cache-size', type=int,
+                        help='valor do pragma cache_size do banco de dados, em páginas ou em KiB se negativo (padrão: o do SQLite)')
+    parser.add_argument('--metrics-interval', type=float, default=10,
+                        help='segundos entre as linhas de resumo das métricas. 0 desabilita a linha periódica (padrão: 10)')
+    parser.add_argument('--metrics-file', help='arquivo texto do Prometheus, reescrito a cada intervalo das métricas')
+    parser.add_argument('--metrics-port', type=int, help='porta do endpoint HTTP /metrics, no formato do Prometheus')
+    parser.add_argument('--no-cache', dest='cache', action='store_false', help='desabilita o cache de endereços')
+    parser.add_argument('--cache-db', default='cache_db.db', help='banco de dados SQLite do cache (padrão: cache_db.db)')
+    parser.add_argument('--cache-precision', type=int, default=5,
+                        help='casas decimais usadas para normalizar as coordenadas no cache (padrão: 5)')
+    parser.add_argument('--cache-ttl', type=float, default=30,
+                        help='tempo de vida de cada entrada do cache, em dias. 0 desabilita a expiração (padrão: 30)')
+    parser.add_argument('--cache-size', type=int, default=100000,
+                        help='quantidade máxima de entradas no cache, com descarte LRU. 0 desabilita o limite (padrão: 100000)')
+    args = parser.parse_args(argv)
+    if args.provider == 'offline' and not args.reference:
+        parser.error('--provider offline exige --reference')
+    for source in args.inputs: # as entradas são verificadas antes de qualquer trabalho; a leitura é feita pela thread leitora
+        if source != '-' and not glob.glob(source):
+            parser.error('arquivo de entrada não encontrado: %s' % source)
+    return args
 
 
-def main():    
+def main(argv=None):    
     """Função principal.
 
-    Primeiramente é criada a fila "q_addr" que será compartilhada entre as threads produtoras e consumidoras. Logo depois, 
+    Primeiramente são criadas as filas "q_addrs" que serão compartilhadas entre as threads produtoras e consumidoras. Logo depois, 
     em apenas uma linha é feita a conexão com banco de dados SQLite. Na própria conexão, o banco de dados já é criado, 
     caso o mesmo não exista. Após a conexão, é criado o cursor para a utilização dos comandos SQL e a função para criar 
-    a tabela é chamada. Em seguida, é feita a leitura dos arquivos texto através da função read_file e cada par de 
-    coordenada é adicionado como tupla na lista "lat_lon". Seguido, temos a parametrização da quantidade de threads a ser 
-    utilizada. As threads são criadas e adicionadas em suas respectivas listas. Com Produtores e Consumidor já em 
+    a tabela é chamada. Em seguida, a thread leitora começa a leitura dos arquivos texto através da função read_sources 
+    e cada par de coordenada é adicionado como tupla na fila limitada "q_coord". Seguido, temos a parametrização da 
+    quantidade de threads a ser utilizada. As threads são criadas e adicionadas em suas respectivas listas. Com Produtores e Consumidor já em 
     execução, a rotina espera as threads produtoras terminarem seu trabalho, em seguida, é feito o mesmo com a thread 
     consumidora. Para finalizar, a tela mostra que as threads terminaram seu trabalho e a conexão com bando de dados é 
     finalizada.
     
     Note:
-        O uso de variáveis globais foi evitado durante o desafio, porém, a fila "q_addr" foi utilizada globalmente para 
-        que as threads produtoras e consumidoras pudessem fazer uso. 
-        APENAS a parametrização da quantidade de threads PRODUTORAS foi desenvolvida. Como dito anteriomente, o uso de 
-        mais de uma thread consumidora não traria ganhos de performance significativo utilizando as versões free da API testada.
+        O uso de variáveis globais foi evitado durante o desafio, porém, as filas "q_coord" e "q_addrs" foram utilizadas 
+        globalmente para que as threads leitora, produtoras e consumidoras pudessem fazer uso. 
+        Com mais de uma thread consumidora (--consumers), cada uma escreve em um banco de partição, e as partições são 
+        copiadas para o banco principal ao final (merge_shards). Com a API versão free uma consumidora é suficiente; 
+        as partições são úteis nas execuções com o cache ou com o provedor offline, em que a escrita é o gargalo.
+        Os parâmetros da execução (arquivos de entrada, provedor, cache de endereços e retomada) são lidos da linha de comando pela função parse_args.
+        Com o provedor offline, nenhuma requisição é feita à rede e o cache não é utilizado.
+        No modo multiprocesso (--mode processes), a leitura dos arquivos e a geocodificação são feitas nos processos de um 
+        ProcessPoolExecutor, criado antes das threads, e a escrita continua nas threads consumidoras.
+        O andamento da execução é mostrado por uma linha de resumo periódica das métricas (metricsReporter), em vez de um 
+        print a cada requisição e a cada escrita.
+        As requisições ao GoogleV3 passam pelo disjuntor (circuitBreaker), que limita a taxa global (--rate), e as que 
+        falham por limite do provedor ou por falhas transitórias são tentadas novamente com backoff (retryPolicy).
+        O índice espacial (R-tree) não é mantido durante a carga, exceto com --reuse-meters; com --spatial-index, é 
+        criado depois que todos os endereços foram gravados.
+        Com --reuse-meters, o índice espacial do banco (addressIndex) é consultado antes de cada requisição, e um endereço 
+        já gravado perto da coordenada é reutilizado. Com mais de uma consumidora, apenas os endereços do banco principal 
+        (de execuções anteriores) são encontrados, pois as partições só são copiadas ao final.
     """
-    global q_addr # Fila utilizada nas threads produtoras e consumidora
-    q_addr = queue.Queue()
+    args = parse_args(argv)
+
+    global reverse # função de geocodificação reversa utilizada pelas threads produtoras
+    if args.provider == 'offline' and args.mode != 'processes': # no modo multiprocesso, cada processo carrega a sua base
+        reverse = offlineGeocoder(args.reference, args.offline_cell).reverse
+    geolocator.timeout = args.request_timeout
+    policy_options = (args.retries, args.backoff_base, args.backoff_max)
+    policy = retryPolicy(*policy_options) # novas tentativas das requisições que falharam
+    limiter = None # disjuntor e limite global de requisições; o provedor offline não é limitado
+    if args.provider == 'google':
+        limiter = circuitBreaker(args.rate, threshold=args.breaker_threshold, cooldown=args.breaker_cooldown)
+
+    global q_coord # Fila limitada de coordenadas, entre a thread leitora e as produtoras
+    q_coord = queue.Queue(maxsize=args.queue_size)
+    amount_consumers = args.consumers; # Parametrizado: com mais de uma, a escrita é feita em partições
+    global q_addrs # Filas utilizadas nas threads produtoras e consumidoras, uma para cada consumidora
+    q_addrs = [queue.Queue(maxsize=args.queue_size) for _ in range(amount_consumers)] # limitadas: as produtoras esperam a escrita
+
+    global metrics # métricas desta execução, com a profundidade de cada fila
+    metrics = runtimeMetrics()
+    metrics.gauge('coord', q_coord.qsize)
+    for shard, q_addr in enumerate(q_addrs):
+        metrics.gauge('addr%d' % shard, q_addr.qsize)
+    reporter = metricsReporter(args.metrics_interval, args.metrics_file, args.metrics_port)
+
+    cache = None
+    cache_options = None
+    if args.cache and args.provider == 'google': # cache de endereços consultado antes de cada requisição
+        cache_options = (args.cache_db, args.cache_precision, args.cache_ttl*24*3600, args.cache_size)
+        if args.mode != 'processes': # no modo multiprocesso, cada processo abre o seu cache (init_worker)
+            cache = addressCache(*cache_options)
+
+    pool = None
+    window = 2*args.workers # tarefas pendentes no pool: mantém todos os processos ocupados sem acumular resultados
+    if args.mode == 'processes':
+        pool = concurrent.futures.ProcessPoolExecutor(args.workers, initializer=init_worker,
+                                                      initargs=(args.provider, args.reference, args.offline_cell, cache_options,
+                                                                (args.rate/args.workers, 0.5, args.breaker_threshold, args.breaker_cooldown)
+                                                                if limiter is not None else None, policy_options, args.request_timeout,
+                                                                (args.database, args.reuse_meters) if args.reuse_meters > 0 else None))
+        pool.submit(int).result() # cria os processos antes de qualquer thread ser iniciada (fork seguro)
+    reporter.start()
     
-    connection = sqlite3.connect('challenge_db.db', check_same_thread=False) # Cria e faz a conexão com o banco de dados
+    connection = sqlite3.connect(args.database, check_same_thread=False) # Cria e faz a conexão com o banco de dados
     c = connection.cursor() # cursor para utilizar comandos sql
     
-    create_table(c) # cria a tabela indicada no desafio
+    configure_database(connection, args.wal, args.synchronous, args.db_cache_size) # pragmas de desempenho
+    create_table(c, spatial=args.reuse_meters > 0) # cria a tabela indicada no desafio; o índice espacial só se consultado na carga
+    progress = jobProgress(connection) # progresso por arquivo de entrada, para o --resume
+    if not args.resume:
+        progress.reset()
+    if amount_consumers == 1:
+        writers = [batchWriter(connection, args.batch_size, args.flush_interval, args.key_precision, progress)] # escrita em lote dos endereços
+    else:
+        writers = []
+        root, extension = os.path.splitext(args.database)
+        for shard in range(amount_consumers): # um banco de partição, com conexão própria, para cada consumidora
+            shard_connection = sqlite3.connect('%s.shard%d%s' % (root, shard, extension), check_same_thread=False)
+            configure_database(shard_connection, args.wal, args.synchronous, args.db_cache_size)
+            create_table(shard_connection.cursor()) # o índice espacial é mantido no banco principal
+            writers.append(batchWriter(shard_connection, args.batch_size, args.flush_interval, args.key_precision, progress))
     
-    # Faz a leitura dos arquivos texto. 'data_points_teste.txt' foi criado para testes, com menos coordenadas
-    # lat_lon = read_file('data_points_teste.txt')
-    lat_lon = read_file('data_points_20180101.txt')
-    lat_lon += read_file('data_points_20180102.txt')
-    lat_lon += read_file('data_points_20180103.txt')
-
-    print("Quantidade de requisições:", len(lat_lon), "\n") # Printa a quantidade de requisições que serão feitas
-#     print(lat_lon)
+    nearby = None # busca de endereços já gravados no banco, antes de cada requisição
+    if args.reuse_meters > 0 and args.mode != 'processes': # no modo multiprocesso, cada processo abre a sua conexão
+        index = addressIndex(sqlite3.connect(args.database, check_same_thread=False)) # conexão própria, só de leitura
+        nearby = lambda coord: index.nearby(coord, args.reuse_meters)
 
     # Escolha da quantidade de threads produtoras
-    amount_producers = 10; # Parametrizado (aconselhavel manter < 50 req/s)
-    amount_consumers = 1; # Parametrização não desenvolvida, manter em 1
+    amount_producers = args.producers; # Parametrizado (aconselhavel manter < 50 req/s)
     
-    producers = callProducers(amount_producers, lat_lon) # começa a execução das threads produtoras
-    consumers = callConsumers(amount_consumers, c, connection) # começa a execução da thread consumidora
+    # Faz a leitura dos arquivos texto em paralelo com as requisições
+    groups = coordinateGroups(args.snap_meters, args.key_precision) # deduplicação dos pares de coordenadas
+    reader = readerThread(0, args.inputs, 1 if args.mode != 'threads' else amount_producers, progress if args.resume else None,
+                          groups, args.fast_parse, pool, window)
+    reader.start()
+
+    if args.mode == 'async': # uma thread com o loop asyncio, limitada por --rate e --concurrency
+        producers = [asyncProducerThread(0, limiter, args.concurrency, args.provider, cache, groups, policy, nearby)]
+        producers[0].start()
+    elif args.mode == 'processes': # uma thread despachante, que envia lotes de coordenadas ao pool de processos
+        producers = [processProducerThread(0, pool, window, groups=groups)]
+        producers[0].start()
+    else:
+        producers = callProducers(amount_producers, cache, groups, limiter, policy, nearby) # começa a execução das threads produtoras
+    consumers = callConsumers(amount_consumers, writers) # começa a execução das threads consumidoras
     
+    reader.join() # espera o fim da leitura dos arquivos
     for thread in producers:
         thread.join() # espera até que as threads produtoras terminem a execução
+    if pool is not None:
+        pool.shutdown()
+    print("Quantidade de requisições:", reader.count - reader.skipped - groups.saved - metrics.counters['reused'], "\n") # Printa a quantidade de coordenadas geocodificadas
+    print("Deduplicação: ", groups.saved, "requisições economizadas") # pares que receberam o endereço de outro par do grupo
+    if args.resume:
+        print("Retomada: ", reader.skipped, "pares já processados foram ignorados")
+    if args.reuse_meters > 0:
+        print("Reutilização: ", metrics.counters['reused'], "pares receberam o endereço já gravado a até", args.reuse_meters, "metros")
+    if metrics.counters['failed']:
+        print("Falhas: ", metrics.counters['failed'], "pares sem endereço (tabela failures), refeitos na retomada (--resume)")
     
     for thread in consumers:
         thread.terminate() # sinaliza que as threads produtoras terminaram e a consumidora já pode finalizar    
+    for thread in consumers:
         thread.join() # espera até que o resto dos endereços seja escrito no banco para finalizar
+    reporter.stop() # resumo final das métricas
     
     for thread in producers:
-        print("Thread ID: ", thread.my_id, "Em execução? ", thread.isAlive()) # mostra que as threads produtoras finalizaram
+        print("Thread ID: ", thread.my_id, "Em execução? ", thread.is_alive()) # mostra que as threads produtoras finalizaram
     print("\n")
     for thread in consumers:
-        print("Thread ID: ", thread.my_id, "Em execução? ", thread.isAlive())# mostra que a thread consumidora finalizou
+        print("Thread ID: ", thread.my_id, "Em execução? ", thread.is_alive())# mostra que a thread consumidora finalizou
     
+    if cache is not None:
+        print("Cache: ", cache.hits, "acertos,", cache.misses, "requisições à API") # requisições economizadas pelo cache
+        cache.close()
+    elif cache_options is not None and args.mode == 'processes':
+        print("Cache: ", metrics.counters['cache_hits'], "acertos,", metrics.counters['cache_misses'], "requisições à API") # soma dos caches dos processos
+
+    if amount_consumers > 1:
+        for writer in writers:
+            writer.connection.close()
+    paths = shard_paths(args.database) # inclui partições de execuções interrompidas
+    if paths:
+        print("Partições: ", merge_shards(connection, paths), "linhas copiadas para o banco principal")
+    if args.spatial_index:
+        create_spatial_index(c) # preenchido de uma vez, depois da carga; se já existia, foi mantido pelos triggers
+
     connection.close() #fecha a conexão com o banco
+    if reader.error is not None: # os arquivos não foram lidos até o fim
+        raise SystemExit('Erro na leitura dos arquivos de entrada: %s' % reader.error)
+    errors = [thread.error for thread in consumers if thread.error is not None]
+    if errors: # endereços descartados: a execução termina com falha (refeita com --resume)
+        raise SystemExit('Erro na escrita do banco de dados: %s' % errors[0])
 
 
 # ### Chama a função principal